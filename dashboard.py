@@ -3,7 +3,13 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+import xlsxwriter
 import io
+import math
+import os
+from functools import lru_cache, partial
+from types import SimpleNamespace
 
 # 1. Setup & Caching
 st.set_page_config(page_title="Digital Marketing Dashboard", layout="wide")
@@ -43,12 +49,413 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# --- PLOTLY TEMPLATE ---
+# Satu template bernama didaftarkan sekali; semua figure (px & go) memakainya sebagai default.
+# Warna grid & margin bersama ada di template, bukan diulang di update_layout tiap figure.
+dashboard_template = go.layout.Template(pio.templates['plotly_white'])
+dashboard_template.layout.update(
+    xaxis=dict(gridcolor='#f0f0f0'),
+    yaxis=dict(gridcolor='#f0f0f0'),
+    margin=dict(t=50, l=25, r=25, b=25),
+)
+pio.templates['dashboard'] = dashboard_template
+pio.templates.default = 'dashboard'
+
+# --- STATIC TEXT ---
+# Teks statis (Tab Strategi & asumsi simulasi) didefinisikan sekali saat import sebagai konstanta modul,
+# bukan string literal yang di-dedent ulang di dalam cabang tab/expander setiap rerun.
+SIM_ASSUMPTIONS = [
+    ("#### 📈 1. Linear Growth", "*Elastisitas Sempurna*", """
+**Konsep:** ROAS dianggap konstan (*Constant Return to Scale*).
+
+**Contoh:** Jika budget ditambah **Rp 100 Juta** pada klien dengan ROAS 2x, maka omzet diproyeksikan naik tepat **Rp 200 Juta**.
+
+⚠️ **Realita:** Di lapangan sering terjadi *Diminishing Return* (efisiensi menurun seiring besarnya budget).
+"""),
+    ("#### 🌊 2. Market Capacity", "*Ketersediaan Pasar*", """
+**Konsep:** Pasar belum jenuh (*Headroom Available*).
+
+Kita mengasumsikan target audiens masih cukup luas untuk menyerap tambahan iklan ini tanpa menyebabkan biaya iklan (CPC/CPM) melonjak drastis secara tiba-tiba.
+"""),
+    ("#### 🎨 3. Creative Stability", "*Kualitas Konten Stabil*", """
+**Konsep:** Performa materi iklan konsisten.
+
+Kita mengasumsikan materi iklan (Gambar/Video) yang ada saat ini masih relevan dan efektif ("Winning Campaign") meskipun frekuensi penayangan ditingkatkan.
+"""),
+]
+
+STRATEGY_MD = """
+Berdasarkan analisis data menyeluruh (Trend, Segmentation, & Simulation), berikut adalah 3 Strategi Utama untuk meningkatkan profitabilitas perusahaan:
+
+### **Strategi 1: Smart Budget Reallocation (Cut Traffic, Scale Sales)**
+* **Masalah:** Ditemukan bahwa **Rp 18.3 Miliar** (52% dari total budget) dihabiskan untuk campaign *Traffic* yang memiliki atribusi purchase nol. Sementara itu, campaign *Sales* terbukti sangat efisien dengan ROAS **1.62x**.
+* **Rekomendasi (Based on Simulation):**
+    * Segera pindahkan **30-50% budget Traffic** ke campaign Sales.
+    * Berdasarkan simulasi, memindahkan 50% budget (Rp 9 M) berpotensi menghasilkan **tambahan omzet sebesar Rp 14.8 Miliar**, atau kenaikan revenue total sebesar **+51%**.
+* **Aksi Taktis:** Ubah objektif iklan dari "Link Clicks" menjadi "Conversions/Purchase" pada akun-akun yang sudah matang (FMCG & Fashion).
+
+### **Strategi 2: Seasonal Sniper (Fokus Q4 & "THR Moment")**
+* **Masalah:** Data tren menunjukkan performa belanja harian *flat* di awal tahun, namun meledak hingga 10x lipat di **Oktober-November** (Q4). Selain itu, Ramadhan memiliki rata-rata harian yang rendah, kecuali lonjakan spesifik di bulan April.
+* **Rekomendasi:**
+    * Terapkan **"Budget Saving Mode"** di Q1-Q3 (Januari-September). Hemat budget, fokus hanya pada *maintenance*.
+    * Lakukan **"All-in Aggressive Spending"** mulai Oktober (untuk event 10.10, 11.11, 12.12).
+    * Untuk Ramadhan: Jangan *spending* besar di awal puasa. Fokuskan budget besar hanya pada **H-10 Lebaran** (saat THR cair), karena data bulan April menunjukkan kenaikan signifikan.
+
+### **Strategi 3: Cross-Pollination Strategy (Copy the Winner)**
+* **Masalah:** Terjadi ketimpangan performa antar klien. **Client C (Fashion)** dan **Client E (FMCG)** adalah "Star" dengan ROAS tinggi, sementara **Client B & D (Beauty)** berada di zona "Alert" (Biaya tinggi, ROAS rendah).
+* **Rekomendasi:**
+    * **Untuk Traffic Objective (Awareness):** Audit kualitas trafik Client Beauty. Cek apakah landing page-nya relevan. Jika *Bounce Rate* tinggi, perbaiki konten website.
+    * **Untuk Sales Objective (Conversion):** Lakukan A/B Testing pada Client Beauty dengan meniru gaya materi kreatif (Creative Benchmarking) dari Client C.
+    * Gunakan audiens yang berhasil di FMCG (Lookalike Audience) untuk ditargetkan silang ke produk Beauty jika demografinya mirip.
+"""
+
+# --- CUSTOM CSS FOR RADIO TABS (Deep Dive) ---
+# Konstanta level modul: string CSS dibangun sekali saat import, bukan di setiap rerun.
+# Tetap di-emit tiap run karena Streamlit menghapus elemen yang tidak dirender ulang.
+RADIO_TAB_CSS = """
+<style>
+    div.row-widget.stRadio > div {
+        flex-direction: row;
+        justify-content: flex-start;
+        gap: 10px;
+        width: 100%;
+    }
+    div.row-widget.stRadio > div > label {
+        background-color: #f0f2f6;
+        padding: 10px 20px;
+        border-radius: 5px;
+        cursor: pointer;
+        border: 1px solid #e0e0e0;
+        font-weight: 600;
+        color: #555;
+        flex-grow: 1;
+        text-align: center;
+    }
+    div.row-widget.stRadio > div > label[data-baseweb="radio"] {
+        background-color: #471470;
+        color: white;
+        border-color: #471470;
+    }
+    div.row-widget.stRadio > div > label:hover {
+        background-color: #f9f9f9;
+        border-color: #471470;
+        color: #471470;
+    }
+</style>
+"""
+
 @st.cache_data
 def load_data():
-    df = pd.read_csv('marketing_data.csv')
-    df['created_date'] = pd.to_datetime(df['created_date'])
+    # Prioritaskan Parquet jika tersedia (kolom sudah bertipe, tanpa parsing teks/tanggal)
+    if os.path.exists('marketing_data.parquet'):
+        df = pd.read_parquet('marketing_data.parquet')
+    else:
+        # Parser pyarrow (C++ multithread, sudah terpasang sebagai dependency streamlit)
+        df = pd.read_csv('marketing_data.csv', engine='pyarrow')
+        df['created_date'] = pd.to_datetime(df['created_date'])
+    # Urutkan sekali berdasarkan tanggal agar filter periode bisa pakai binary search
+    df = df.sort_values('created_date', kind='stable').reset_index(drop=True)
+    # Kolom filter/groupby disimpan sebagai category (int codes, bukan string Python)
+    for col in ('client_name', 'industry', 'campaign_objective'):
+        df[col] = df[col].astype('category')
+    # Kolom 'month' dari sumber sudah berformat 'YYYY-MM' (urutan leksikografis = kronologis),
+    # jadi cukup dijadikan category sekali di sini tanpa konversi to_period per filter
+    df['month'] = df['month'].astype('category')
+    # Kolom uang & rasio (amount_spent, purchase_value, roas, cpc, ctr_percentage) tetap float64:
+    # nilai sumber punya pecahan rupiah, float32 membulatkannya dan total Overview jadi tidak cocok dengan export.
+    # Hitungan clicks/impressions di-downcast ke int bertanda (bukan unsigned) supaya hasil sum tetap int64
+    # dan bisa digabung dengan kolom funnel lain tanpa jatuh ke dtype object.
+    for col in ('clicks', 'impressions'):
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    # Flag musiman dipastikan bool (1 byte/baris) agar groupby Ramadhan/Weekend tidak lewat object
+    for col in ('is_ramadhan', 'is_weekend'):
+        df[col] = df[col].astype(bool)
     return df
 
+# --- ROLLUP TABLE (Overview Tab) ---
+# Tab Overview tidak butuh granularitas baris mentah, cukup total per (tanggal, klien, objective).
+# Mean roas/cpc/ctr direkonstruksi dari *_sum / row_count agar hasilnya sama dengan mean per baris.
+@st.cache_data
+def load_rollup():
+    df = load_data()
+    rollup = df.groupby(['created_date', 'client_name', 'campaign_objective'], observed=True).agg(
+        amount_spent=('amount_spent', 'sum'),
+        purchase_value=('purchase_value', 'sum'),
+        clicks=('clicks', 'sum'),
+        impressions=('impressions', 'sum'),
+        roas_sum=('roas', 'sum'),
+        cpc_sum=('cpc', 'sum'),
+        ctr_sum=('ctr_percentage', 'sum'),
+        row_count=('roas', 'size'),
+    ).reset_index()
+    # Mean per grup, dipakai langsung oleh scatter plot
+    rollup['roas'] = rollup['roas_sum'] / rollup['row_count']
+    rollup['cpc'] = rollup['cpc_sum'] / rollup['row_count']
+    rollup['ctr_percentage'] = rollup['ctr_sum'] / rollup['row_count']
+    return rollup
+
+# Tanggal (sudah terurut) sebagai int64 nanodetik, dihitung sekali.
+# cache_resource: array read-only dipakai bersama tanpa disalin di setiap rerun
+@st.cache_resource
+def load_date_codes(rollup=False):
+    source = load_rollup() if rollup else load_data()
+    return source['created_date'].to_numpy(dtype='datetime64[ns]').view('i8')
+
+def to_date_code(value):
+    return np.datetime64(pd.to_datetime(value), 'ns').view('i8')
+
+@st.cache_data
+def apply_filters(start, end, clients, objectives, rollup=False, columns=None):
+    df = load_rollup() if rollup else load_data()
+    # Slice rentang tanggal via searchsorted (O(log N)), lalu isin hanya pada slice tersebut
+    date_codes = load_date_codes(rollup)
+    lo = np.searchsorted(date_codes, to_date_code(start), side='left')
+    hi = np.searchsorted(date_codes, to_date_code(end), side='right')
+    sub = df.iloc[lo:hi]
+    mask = (sub['client_name'].isin(clients)) & \
+           (sub['campaign_objective'].isin(objectives))
+    if columns is not None:
+        # Proyeksi kolom sebelum masking: hanya kolom yang dibutuhkan yang ikut disalin
+        return sub.loc[mask, list(columns)]
+    return sub[mask]
+
+# --- CACHED AGGREGATES (Overview Tab) ---
+# Dipanggil ulang di setiap rerun, tapi hanya dihitung sekali per kombinasi filter
+@st.cache_data
+def compute_period_metrics(prev_start, current_start, current_end, clients, objectives):
+    # Satu filter [prev_start, current_end] + satu groupby per periode (prev/curr),
+    # lalu satu pass .agg() untuk semua KPI di kedua periode
+    sum_cols = ('amount_spent', 'purchase_value', 'clicks', 'impressions',
+                'roas_sum', 'cpc_sum', 'ctr_sum', 'row_count')
+    date_codes = load_date_codes(rollup=True)
+    current_start_code = to_date_code(current_start)
+
+    if current_start_code <= date_codes[0]:
+        # Previous Period seluruhnya sebelum awal data (mis. default "semua data"):
+        # lewati filter & split periode, cukup jumlahkan periode saat ini
+        combined = apply_filters(current_start, current_end, clients, objectives, rollup=True, columns=sum_cols)
+        agg = pd.DataFrame({'curr': combined.sum()}).T
+    else:
+        combined = apply_filters(prev_start, current_end, clients, objectives, rollup=True, columns=sum_cols)
+        # Index combined = posisi baris di load_rollup(), jadi bisa langsung ambil int64 code-nya
+        is_prev = date_codes[combined.index.to_numpy()] < current_start_code
+        period = np.where(is_prev, 'prev', 'curr')
+        agg = combined.groupby(period).sum()
+
+    metrics = {}
+    for key in ('curr', 'prev'):
+        # Periode tanpa data -> semua metrik 0 (sama seperti frame kosong)
+        row = agg.loc[key] if key in agg.index else pd.Series(0.0, index=agg.columns)
+        row_count = max(row['row_count'], 1)
+        metrics[key] = {
+            'available': key in agg.index,
+            'spend': row['amount_spent'],
+            'purchase': row['purchase_value'],
+            'roas': row['roas_sum'] / row_count,
+            'cpc': row['cpc_sum'] / row_count,
+            'ctr': row['ctr_sum'] / row_count,
+            'clicks': row['clicks'],
+            'impressions': row['impressions'],
+        }
+    return metrics
+
+# Agregat chart Overview: di-key dengan filter_key seperti agregat Deep Dive, filtered_rollup
+# diberi prefix "_" agar tidak di-hash ulang di setiap rerun
+@st.cache_data
+def compute_daily_trend(filter_key, _data):
+    data = _data
+    return data.groupby('created_date')[['amount_spent', 'purchase_value']].sum().reset_index()
+
+@st.cache_data
+def compute_spend_by_client(filter_key, _data):
+    data = _data
+    return data.groupby('client_name', observed=True)['amount_spent'].sum().reset_index()
+
+@st.cache_data
+def compute_roas_by_obj(filter_key, _data):
+    data = _data
+    roas_by_obj = data.groupby('campaign_objective', observed=True)[['roas_sum', 'row_count']].sum().reset_index()
+    roas_by_obj['roas'] = roas_by_obj['roas_sum'] / roas_by_obj['row_count']
+    return roas_by_obj[['campaign_objective', 'roas']]
+
+@st.cache_data
+def compute_ctr_by_obj(filter_key, _data):
+    data = _data
+    ctr_by_obj = data.groupby('campaign_objective', observed=True)[['clicks', 'impressions']].sum().reset_index()
+    ctr_by_obj['ctr'] = (ctr_by_obj['clicks'] / ctr_by_obj['impressions']) * 100
+    return ctr_by_obj
+
+# ROAS = revenue / spend, 0 jika spend = 0. Satu pass pembagian tanpa warning divide-by-zero
+def safe_roas(pv, spend):
+    pv = np.asarray(pv, dtype=np.float64)
+    spend = np.asarray(spend, dtype=np.float64)
+    return np.divide(pv, spend, out=np.zeros_like(pv), where=spend > 0)
+
+# Format Rupiah ringkas (M / Mio). Skalar di-memo dengan lru_cache: rerun fragment simulator
+# (slider/selectbox) memformat nilai yang sama berulang kali, cukup lookup dict
+@lru_cache(maxsize=4096)
+def format_idr_scalar(value):
+    if value >= 1_000_000_000:
+        return f"IDR {value / 1_000_000_000:.2f} M"
+    if value >= 1_000_000:
+        return f"IDR {value / 1_000_000:.2f} Mio"
+    return f"IDR {value:,.0f}"
+
+def format_idr(value):
+    # Array-safe: skalar -> string, array/Series -> array string dengan shape yang sama
+    values = np.asarray(value, dtype=np.float64)
+    if values.ndim == 0:
+        return format_idr_scalar(float(values))
+    conds = [values >= 1_000_000_000, values >= 1_000_000]
+    scaled = np.select(conds, [values / 1_000_000_000, values / 1_000_000], default=values)
+    suffixes = np.select(conds, [" M", " Mio"], default="")
+    labels = [
+        f"IDR {v:.2f}{suffix}" if suffix else f"IDR {v:,.0f}"
+        for v, suffix in zip(scaled.ravel(), suffixes.ravel())
+    ]
+    return np.array(labels).reshape(values.shape)
+
+# --- CACHED AGGREGATES (Deep Dive Tab) ---
+# Di-key dengan filter_key (tuple filter sidebar). Argumen DataFrame diberi prefix "_"
+# agar Streamlit tidak perlu meng-hash seluruh filtered_df di setiap rerun.
+@st.cache_data
+def compute_monthly_trend(filter_key, _data):
+    monthly_trend = _data.groupby('month', observed=True)[['purchase_value', 'amount_spent']].sum().reset_index()
+    monthly_trend['roas'] = safe_roas(monthly_trend['purchase_value'], monthly_trend['amount_spent'])
+    # 'month' sudah string 'YYYY-MM' (category): astype(str) hanya memetakan kategori, tanpa loop Period.__str__
+    monthly_trend['month_str'] = monthly_trend['month'].astype(str)
+    return monthly_trend
+
+@st.cache_data
+def compute_daily_revenue(filter_key, _data):
+    return _data.groupby('created_date')[['purchase_value']].sum().reset_index()
+
+@st.cache_data
+def compute_seasonality(filter_key, _data):
+    ramadhan_perf = _data.groupby('is_ramadhan')[['purchase_value']].mean().reset_index()
+    ramadhan_perf['status'] = ramadhan_perf['is_ramadhan'].map({True: 'Ramadhan', False: 'Normal Days'})
+
+    weekend_perf = _data.groupby('is_weekend')[['purchase_value']].mean().reset_index()
+    weekend_perf['status'] = weekend_perf['is_weekend'].map({True: 'Weekend', False: 'Weekday'})
+    return ramadhan_perf, weekend_perf
+
+@st.cache_data
+def compute_industry_perf(filter_key, _data):
+    # Satu reduksi sum per kolom (tanpa MultiIndex). Baris tetap urut nama industri: idxmax (tie-break)
+    # dan urutan warna chart bergantung pada urutan ini, jadi tidak boleh ikut urutan baris data
+    industry_perf = _data.groupby('industry', observed=True).agg(
+        total_revenue=('purchase_value', 'sum'),
+        total_spend=('amount_spent', 'sum'),
+    ).reset_index()
+    # Hitung ROAS
+    industry_perf['roas'] = safe_roas(industry_perf['total_revenue'], industry_perf['total_spend'])
+    return industry_perf
+
+@st.cache_data
+def compute_client_perf(filter_key, _data):
+    # Urut nama klien (bukan urutan kemunculan di data) agar idxmax & chart deterministik
+    client_perf = _data.groupby(['client_name', 'industry'], observed=True)[['purchase_value', 'amount_spent']].sum().reset_index()
+    client_perf['roas'] = safe_roas(client_perf['purchase_value'], client_perf['amount_spent'])
+    return client_perf
+
+# Matrix per klien (Section 4) di-rollup dari hasil cache compute_client_perf (Section 2),
+# bukan groupby ulang atas seluruh baris filtered_df
+@st.cache_data
+def compute_client_matrix(filter_key, _data):
+    client_perf = compute_client_perf(filter_key, _data)
+    client_matrix = client_perf.groupby('client_name', observed=True)[['purchase_value', 'amount_spent']].sum().reset_index()
+    client_matrix['roas'] = safe_roas(client_matrix['purchase_value'], client_matrix['amount_spent'])
+    return client_matrix
+
+# Kolom yang dipakai simulasi & laporan Excel diambil sekali per filter_key sebagai array NumPy
+# (struct-of-arrays); cache_resource: array read-only dipakai bersama tanpa disalin
+@st.cache_resource(max_entries=32)
+def get_report_arrays(filter_key, _data):
+    # client_name sudah category sejak load_data: kode int-nya dipakai langsung untuk agregasi per klien
+    # (np.bincount), tanpa hash string dan tanpa konversi ulang di export
+    client_col = _data['client_name']
+    return SimpleNamespace(
+        spend=_data['amount_spent'].to_numpy(),
+        revenue=_data['purchase_value'].to_numpy(),
+        roas=_data['roas'].to_numpy(),
+        cpc=_data['cpc'].to_numpy(),
+        ctr=_data['ctr_percentage'].to_numpy(),
+        dates=_data['created_date'].to_numpy(),
+        client_codes=client_col.cat.codes.to_numpy(),
+        client_names=client_col.cat.categories,
+    )
+
+# Baseline simulasi (total spend & revenue) hanya bergantung pada filter, bukan pada slider.
+# Dijumlah langsung di array NumPy (tanpa jalur Series.sum) dengan akumulator float64 seperti sheet Excel.
+@st.cache_data
+def compute_sim_baseline(filter_key, _data):
+    cols = get_report_arrays(filter_key, _data)
+    spend, revenue = cols.spend, cols.revenue
+    return float(np.nansum(spend, dtype=np.float64)), float(np.nansum(revenue, dtype=np.float64))
+
+# Opsi filter sidebar cukup dibaca sekali dari kategori kolom
+@st.cache_data
+def get_option_lists():
+    df = load_data()
+    return df['client_name'].cat.categories.tolist(), df['campaign_objective'].cat.categories.tolist()
+
+# Sampling terstratifikasi per klien untuk scatter plot, agar jumlah titik
+# yang dikirim ke browser tetap terbatas (proporsi antar klien tetap terjaga)
+@st.cache_data
+def sample_for_scatter(filter_key, _data, max_points=5000):
+    data = _data
+    if len(data) <= max_points:
+        return data
+    return data.groupby('client_name', observed=True, group_keys=False).sample(
+        frac=max_points / len(data), random_state=0
+    )
+
+# --- ANOMALY DETECTION KERNEL ---
+# Rolling mean/std (ddof=1, sama seperti pandas .rolling().std()) + flag anomali
+# langsung di array numpy, tanpa membuat Series perantara
+def rolling_anomaly(x, w=7, k=2.0):
+    x = np.asarray(x, dtype=np.float64)
+    out = np.zeros(x.size, dtype=bool)
+    if x.size < w:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(x, w)
+    mean = windows.mean(axis=1)
+    std = windows.std(axis=1, ddof=1)
+    tail = x[w - 1:]
+    out[w - 1:] = (tail > mean + k * std) | (tail < mean - k * std)
+    return out
+
+# --- LTTB DOWNSAMPLING ---
+# Largest-Triangle-Three-Buckets: pilih n_out titik yang paling menjaga bentuk kurva.
+# Mengembalikan indeks baris terpilih (titik pertama & terakhir selalu ikut).
+LTTB_THRESHOLD = 2000
+LTTB_POINTS = 1000
+
+def lttb_indices(x, y, n_out):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = x.size
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # Bucket untuk titik tengah (tanpa titik pertama & terakhir)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    out[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Titik acuan = rata-rata bucket berikutnya (atau titik terakhir)
+        if i + 2 < n_out - 1:
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
 try:
     df = load_data()
 except FileNotFoundError:
@@ -83,8 +490,9 @@ with st.sidebar.expander("📅 Periode Waktu", expanded=True):
 
 # Collapsible Filter: Kategori
 with st.sidebar.expander("🏢 Filter Kategori", expanded=True):
+    client_list, objective_list = get_option_lists()
+
     # Filter Client
-    client_list = df['client_name'].unique().tolist()
     selected_clients = st.multiselect(
         "Select Client(s)",
         options=client_list,
@@ -92,20 +500,19 @@ with st.sidebar.expander("🏢 Filter Kategori", expanded=True):
     )
 
     # Filter Campaign Objective (New)
-    objective_list = df['campaign_objective'].unique().tolist()
     selected_objectives = st.multiselect(
         "Select Campaign Objective",
         options=objective_list,
         default=objective_list
     )
 
-# Apply Filters
-mask = (df['client_name'].isin(selected_clients)) & \
-       (df['campaign_objective'].isin(selected_objectives)) & \
-       (df['created_date'] >= pd.to_datetime(start_date)) & \
-       (df['created_date'] <= pd.to_datetime(end_date))
+# Apply Filters (tuple agar bisa di-hash oleh st.cache_data)
+selected_clients = tuple(selected_clients)
+selected_objectives = tuple(selected_objectives)
 
-filtered_df = df[mask]
+filtered_df = apply_filters(start_date, end_date, selected_clients, selected_objectives)
+# Key cache untuk agregasi/figure turunan filtered_df
+filter_key = (start_date, end_date, selected_clients, selected_objectives)
 
 if filtered_df.empty:
     st.warning("No data available based on the current filters.")
@@ -121,6 +528,9 @@ overview_tab, deep_dive_tab, strategy_tab = st.tabs(["📊 Overview & KPI", "
 # =====================================================================
 with overview_tab:
     st.header("Executive Summary")
+
+    # Semua agregasi di tab ini memakai rollup (tanggal x klien x objective), bukan baris mentah
+    filtered_rollup = apply_filters(start_date, end_date, selected_clients, selected_objectives, rollup=True)
     
     # --- LOGIKA PERHITUNGAN DELTA (PREVIOUS PERIOD) ---
     # 1. Hitung durasi filter saat ini
@@ -132,14 +542,10 @@ with overview_tab:
     prev_end = current_start - pd.Timedelta(days=1)
     prev_start = prev_end - pd.Timedelta(days=delta_days)
     
-    # 3. Filter data untuk periode sebelumnya
+    # 3. Hitung metrik periode saat ini & sebelumnya sekaligus
     # Kita tetap respect filter Client/Objective, cuma ganti tanggal
-    mask_prev = (df['client_name'].isin(selected_clients)) & \
-                (df['campaign_objective'].isin(selected_objectives)) & \
-                (df['created_date'] >= prev_start) & \
-                (df['created_date'] <= prev_end)
-    
-    prev_filtered_df = df[mask_prev]
+    period_metrics = compute_period_metrics(prev_start, current_start, current_end, selected_clients, selected_objectives)
+    has_prev_data = period_metrics['prev']['available']
     
     # 4. Helper Function untuk menghitung Delta %
     def calculate_delta(current_val, prev_val, is_percentage=False):
@@ -154,30 +560,24 @@ with overview_tab:
             return f"{percent_change:+.1f}% vs Prev"
 
     # --- HITUNG CURRENT METRICS ---
-    curr_spend = filtered_df['amount_spent'].sum()
-    curr_purchase = filtered_df['purchase_value'].sum()
-    curr_roas = filtered_df['roas'].mean()
-    curr_cpc = filtered_df['cpc'].mean()
-    curr_ctr = filtered_df['ctr_percentage'].mean()
+    curr_metrics = period_metrics['curr']
+    curr_spend = curr_metrics['spend']
+    curr_purchase = curr_metrics['purchase']
+    curr_roas = curr_metrics['roas']
+    curr_cpc = curr_metrics['cpc']
+    curr_ctr = curr_metrics['ctr']
 
     # --- HITUNG PREVIOUS METRICS ---
-    prev_spend = prev_filtered_df['amount_spent'].sum()
-    prev_purchase = prev_filtered_df['purchase_value'].sum()
-    prev_roas = prev_filtered_df['roas'].mean() if not prev_filtered_df.empty else 0
-    prev_cpc = prev_filtered_df['cpc'].mean() if not prev_filtered_df.empty else 0
-    prev_ctr = prev_filtered_df['ctr_percentage'].mean() if not prev_filtered_df.empty else 0
+    prev_metrics = period_metrics['prev']
+    prev_spend = prev_metrics['spend']
+    prev_purchase = prev_metrics['purchase']
+    prev_roas = prev_metrics['roas']
+    prev_cpc = prev_metrics['cpc']
+    prev_ctr = prev_metrics['ctr']
 
     # --- TAMPILKAN METRICS DENGAN DELTA ---
     col1, col2, col3, col4, col5 = st.columns(5)
 
-    def format_idr(value):
-        if value >= 1_000_000_000:
-            return f"IDR {value / 1_000_000_000:.2f} M"
-        elif value >= 1_000_000:
-            return f"IDR {value / 1_000_000:.2f} Mio"
-        else:
-            return f"IDR {value:,.0f}"
-
     col1.metric(
         "Total Spend", 
         format_idr(curr_spend), 
@@ -207,7 +607,7 @@ with overview_tab:
     )
 
     # Dynamic Caption for Context
-    if not prev_filtered_df.empty:
+    if has_prev_data:
         st.caption(f"ℹ️ *Perbandingan dilakukan terhadap periode sebelumnya ({prev_start.strftime('%d %b')} - {prev_end.strftime('%d %b %Y')})*")
     else:
         st.caption("ℹ️ *Data periode sebelumnya tidak tersedia untuk perbandingan (Awal data tercapai atau rentang waktu terlalu luas).*")
@@ -218,11 +618,12 @@ with overview_tab:
     st.subheader("💡 Automated Data Highlights")
     
     # 1. Insight: Market Dominance
-    if not filtered_df.empty:
-        top_client_data = filtered_df.groupby('client_name')['purchase_value'].sum().sort_values(ascending=False).head(1)
-        top_client_name = top_client_data.index[0]
-        top_client_val = top_client_data.values[0]
-        total_rev = filtered_df['purchase_value'].sum()
+    if not filtered_rollup.empty:
+        # idxmax (O(k)) cukup untuk top-1, tanpa sort seluruh klien
+        client_revenue = filtered_rollup.groupby('client_name', observed=True)['purchase_value'].sum()
+        top_client_name = client_revenue.idxmax()
+        top_client_val = client_revenue.loc[top_client_name]
+        total_rev = filtered_rollup['purchase_value'].sum()
         dominance_pct = (top_client_val / total_rev * 100) if total_rev > 0 else 0
         
         insight_1 = f"**{top_client_name}** mendominasi pasar dengan kontribusi omzet sebesar **{dominance_pct:.1f}%** dari total pendapatan."
@@ -230,7 +631,7 @@ with overview_tab:
         insight_1 = "Data tidak cukup untuk analisis dominasi pasar."
 
     # 2. Insight: Cost Trend
-    if not prev_filtered_df.empty:
+    if has_prev_data:
         spend_diff = curr_spend - prev_spend
         spend_pct = (spend_diff / prev_spend * 100) if prev_spend > 0 else 0
         trend_text = "naik" if spend_diff > 0 else "turun"
@@ -239,10 +640,10 @@ with overview_tab:
         insight_2 = "Perbandingan biaya dengan periode lalu tidak tersedia."
 
     # 3. Insight: Efficiency Winner
-    if not filtered_df.empty:
-        best_obj_data = filtered_df.groupby('campaign_objective')['roas'].mean().sort_values(ascending=False).head(1)
-        best_obj_name = best_obj_data.index[0]
-        best_obj_val = best_obj_data.values[0]
+    if not filtered_rollup.empty:
+        obj_roas = compute_roas_by_obj(filter_key, filtered_rollup).set_index('campaign_objective')['roas']
+        best_obj_name = obj_roas.idxmax()
+        best_obj_val = obj_roas.loc[best_obj_name]
         insight_3 = f"Strategi **{best_obj_name}** adalah yang paling efisien dengan rata-rata ROAS **{best_obj_val:.2f}x**."
     else:
         insight_3 = "Data ROAS tidak tersedia."
@@ -256,87 +657,104 @@ with overview_tab:
     st.markdown("---")
 
     # 4. Visualisasi Utama (KPI Charts)
+    # Figure di-cache per kombinasi filter (filter_key). Argumen DataFrame diberi prefix "_"
+    # agar tidak di-hash oleh Streamlit; Figure yang sama dipakai ulang di setiap rerun.
+
     col_chart1, col_chart2 = st.columns(2)
 
     # Grafik 1 (Line Chart): Tren Bulanan with Anomaly Detection
-    daily_trend = filtered_df.groupby('created_date')[['amount_spent', 'purchase_value']].sum().reset_index()
-    
-    # --- ANOMALY DETECTION LOGIC ---
-    try:
+    @st.cache_resource(max_entries=32)
+    def build_daily_trend_fig(filter_key, _daily_trend):
+        daily_trend = _daily_trend
+
+        # --- ANOMALY DETECTION LOGIC ---
         if len(daily_trend) > 7:
-            daily_trend['rolling_mean'] = daily_trend['purchase_value'].rolling(window=7).mean()
-            daily_trend['rolling_std'] = daily_trend['purchase_value'].rolling(window=7).std()
-            # Define Anomaly: Value > Mean + 2*Std (Spike) or Value < Mean - 2*Std (Drop)
-            daily_trend['is_anomaly'] = ((daily_trend['purchase_value'] > (daily_trend['rolling_mean'] + 2 * daily_trend['rolling_std'])) | 
-                                         (daily_trend['purchase_value'] < (daily_trend['rolling_mean'] - 2 * daily_trend['rolling_std'])))
+            # Define Anomaly: Value > Mean + 2*Std (Spike) or Value < Mean - 2*Std (Drop), rolling 7 hari
+            daily_trend['is_anomaly'] = rolling_anomaly(daily_trend['purchase_value'].to_numpy())
             anomalies = daily_trend[daily_trend['is_anomaly']]
         else:
             anomalies = pd.DataFrame()
-    except Exception:
-        anomalies = pd.DataFrame()
-
-    daily_trend_melted = daily_trend.melt(id_vars='created_date', value_vars=['amount_spent', 'purchase_value'], var_name='Metric', value_name='Value')
-
-    fig_line = px.line(
-        daily_trend_melted, 
-        x='created_date', 
-        y='Value', 
-        color='Metric',
-        title="Daily Trend: Spend vs Purchase Value (with Anomaly Detection)",
-        template="plotly_white"
-    )
-    
-    # Add Anomaly Markers
-    if not anomalies.empty:
-        fig_line.add_trace(go.Scatter(
-            x=anomalies['created_date'],
-            y=anomalies['purchase_value'],
-            mode='markers',
-            name='Anomaly (Spike/Drop)',
-            marker=dict(color='red', size=10, symbol='x'),
-            text=['Anomaly Detected'] * len(anomalies),
-            hoverinfo='text+x+y'
-        ))
 
+        # Dua trace langsung dari frame wide (tanpa melt ke long-form)
+        fig_line = go.Figure()
+        for metric in ['amount_spent', 'purchase_value']:
+            fig_line.add_trace(go.Scatter(
+                x=daily_trend['created_date'],
+                y=daily_trend[metric],
+                mode='lines',
+                name=metric
+            ))
+        fig_line.update_layout(
+            title="Daily Trend: Spend vs Purchase Value (with Anomaly Detection)",
+            xaxis_title='created_date',
+            yaxis_title='Value',
+            legend_title_text='Metric',
+        )
+
+        # Add Anomaly Markers
+        if not anomalies.empty:
+            fig_line.add_trace(go.Scatter(
+                x=anomalies['created_date'],
+                y=anomalies['purchase_value'],
+                mode='markers',
+                name='Anomaly (Spike/Drop)',
+                marker=dict(color='red', size=10, symbol='x'),
+                text=['Anomaly Detected'] * len(anomalies),
+                hoverinfo='text+x+y'
+            ))
+        return fig_line
+
+    daily_trend = compute_daily_trend(filter_key, filtered_rollup)
+    fig_line = build_daily_trend_fig(filter_key, daily_trend)
     col_chart1.plotly_chart(fig_line, use_container_width=True)
 
     # Grafik 2 (Pie Chart - New): Proporsi Spend by Client
-    spend_by_client = filtered_df.groupby('client_name')['amount_spent'].sum().reset_index()
-    fig_pie = px.pie(
-        spend_by_client,
-        values='amount_spent',
-        names='client_name',
-        title="Total Ad Spend Distribution by Client",
-        template="plotly_white"
-    )
+    @st.cache_resource(max_entries=32)
+    def build_pie(filter_key, _spend_by_client):
+        return px.pie(
+            _spend_by_client,
+            values='amount_spent',
+            names='client_name',
+            title="Total Ad Spend Distribution by Client",
+        )
+
+    spend_by_client = compute_spend_by_client(filter_key, filtered_rollup)
+    fig_pie = build_pie(filter_key, spend_by_client)
     col_chart2.plotly_chart(fig_pie, use_container_width=True)
 
 
     col_chart3, col_chart4 = st.columns(2)
 
     # Grafik 3 (Bar Chart): ROAS by Campaign Objective
-    roas_by_obj = filtered_df.groupby('campaign_objective')['roas'].mean().reset_index()
-    fig_bar = px.bar(
-        roas_by_obj,
-        x='campaign_objective',
-        y='roas',
-        color='campaign_objective',
-        title="Average ROAS by Campaign Objective",
-        template="plotly_white"
-    )
+    @st.cache_resource(max_entries=32)
+    def build_roas_bar(filter_key, _roas_by_obj):
+        return px.bar(
+            _roas_by_obj,
+            x='campaign_objective',
+            y='roas',
+            color='campaign_objective',
+            title="Average ROAS by Campaign Objective",
+        )
+
+    roas_by_obj = compute_roas_by_obj(filter_key, filtered_rollup)
+    fig_bar = build_roas_bar(filter_key, roas_by_obj)
     col_chart3.plotly_chart(fig_bar, use_container_width=True)
 
     # Grafik 4 (Scatter Plot): CPC vs CTR (Efficiency)
-    fig_scatter = px.scatter(
-        filtered_df, 
-        x='cpc', 
-        y='ctr_percentage', 
-        color='client_name',
-        size='amount_spent', # Bubble size based on spend
-        title="Ad Efficiency: CPC vs CTR (Size = Spend)",
-        hover_data=['campaign_objective'],
-        template="plotly_white"
-    )
+    @st.cache_resource(max_entries=32)
+    def build_efficiency_scatter(filter_key, _scatter_df):
+        return px.scatter(
+            _scatter_df, 
+            x='cpc', 
+            y='ctr_percentage', 
+            color='client_name',
+            size='amount_spent', # Bubble size based on spend
+            title="Ad Efficiency: CPC vs CTR (Size = Spend)",
+            hover_data=['campaign_objective'],
+        )
+
+    scatter_df = sample_for_scatter(filter_key, filtered_rollup)
+    fig_scatter = build_efficiency_scatter(filter_key, scatter_df)
     col_chart4.plotly_chart(fig_scatter, use_container_width=True)
 
     # Performance Metrics Section (New Analysis)
@@ -353,20 +771,21 @@ with overview_tab:
     """)
 
     # Calculations on Filtered Data
+    # (Reuse hasil agregasi KPI di atas, tanpa scan ulang data)
     # 1. Overall CTR
-    total_clicks_metric = filtered_df['clicks'].sum()
-    total_impressions_metric = filtered_df['impressions'].sum()
+    total_clicks_metric = curr_metrics['clicks']
+    total_impressions_metric = curr_metrics['impressions']
     overall_ctr = (total_clicks_metric / total_impressions_metric * 100) if total_impressions_metric > 0 else 0
 
     # 2. Total Purchase Value (Omzet)
-    total_omzet_metric = filtered_df['purchase_value'].sum()
+    total_omzet_metric = curr_purchase
 
     # 3. Overall ROAS
-    total_spend_metric = filtered_df['amount_spent'].sum()
+    total_spend_metric = curr_spend
     overall_roas_metric = (total_omzet_metric / total_spend_metric) if total_spend_metric > 0 else 0
 
     # 4. ROAS (Sales Only)
-    sales_only_df = filtered_df[filtered_df['campaign_objective'] == 'Sales']
+    sales_only_df = filtered_rollup[filtered_rollup['campaign_objective'] == 'Sales']
     sales_spend = sales_only_df['amount_spent'].sum()
     sales_rev = sales_only_df['purchase_value'].sum()
     roas_sales_only = (sales_rev / sales_spend) if sales_spend > 0 else 0
@@ -382,40 +801,46 @@ with overview_tab:
     col_perf1, col_perf2 = st.columns(2)
 
     # Chart A: CTR Comparison
-    ctr_by_obj = filtered_df.groupby('campaign_objective')[['clicks', 'impressions']].sum().reset_index()
-    ctr_by_obj['ctr'] = (ctr_by_obj['clicks'] / ctr_by_obj['impressions']) * 100
+    @st.cache_resource(max_entries=32)
+    def build_ctr_bar(filter_key, _ctr_by_obj):
+        fig_ctr = px.bar(
+            _ctr_by_obj, 
+            x='campaign_objective', 
+            y='ctr',
+            text_auto='.2f',
+            title="A.2: Click-Through Rate (CTR) Comparison",
+            color='campaign_objective',
+            labels={'ctr': 'CTR (%)'}
+        )
+        fig_ctr.update_traces(textposition='outside')
+        fig_ctr.update_layout(yaxis_range=[0, max(_ctr_by_obj['ctr']) * 1.2]) # Add space for text
+        return fig_ctr
 
-    fig_ctr = px.bar(
-        ctr_by_obj, 
-        x='campaign_objective', 
-        y='ctr',
-        text_auto='.2f',
-        title="A.2: Click-Through Rate (CTR) Comparison",
-        color='campaign_objective',
-        template="plotly_white",
-        labels={'ctr': 'CTR (%)'}
-    )
-    fig_ctr.update_traces(textposition='outside')
-    fig_ctr.update_layout(yaxis_range=[0, max(ctr_by_obj['ctr']) * 1.2]) # Add space for text
+    ctr_by_obj = compute_ctr_by_obj(filter_key, filtered_rollup)
+    fig_ctr = build_ctr_bar(filter_key, ctr_by_obj)
     col_perf1.plotly_chart(fig_ctr, use_container_width=True)
 
     # Chart B: Spend vs Revenue
-    fin_data = pd.DataFrame({
-        'Metric': ['Total Spend', 'Total Revenue'],
-        'Value': [total_spend_metric, total_omzet_metric]
-    })
+    @st.cache_resource(max_entries=32)
+    def build_spend_revenue_bar(filter_key, total_spend, total_revenue):
+        fin_data = pd.DataFrame({
+            'Metric': ['Total Spend', 'Total Revenue'],
+            'Value': [total_spend, total_revenue]
+        })
+
+        fig_fin = px.bar(
+            fin_data, 
+            x='Metric', 
+            y='Value', 
+            text_auto='.2s', 
+            title="A.3 & A.4: Total Spend vs Revenue",
+            color='Metric',
+            color_discrete_sequence=['#ff7f0e', '#2ca02c'] 
+        )
+        fig_fin.update_traces(textposition='outside')
+        return fig_fin
 
-    fig_fin = px.bar(
-        fin_data, 
-        x='Metric', 
-        y='Value', 
-        text_auto='.2s', 
-        title="A.3 & A.4: Total Spend vs Revenue",
-        color='Metric',
-        template="plotly_white",
-        color_discrete_sequence=['#ff7f0e', '#2ca02c'] 
-    )
-    fig_fin.update_traces(textposition='outside')
+    fig_fin = build_spend_revenue_bar(filter_key, total_spend_metric, total_omzet_metric)
     col_perf2.plotly_chart(fig_fin, use_container_width=True)
 
 
@@ -428,37 +853,7 @@ with deep_dive_tab:
     # ---------------------------------------------------------------------
     
     # Custom CSS to style Radio Buttons as Tabs
-    st.markdown("""
-        <style>
-        div.row-widget.stRadio > div {
-            flex-direction: row;
-            justify-content: flex-start;
-            gap: 10px;
-            width: 100%;
-        }
-        div.row-widget.stRadio > div > label {
-            background-color: #f0f2f6;
-            padding: 10px 20px;
-            border-radius: 5px;
-            cursor: pointer;
-            border: 1px solid #e0e0e0;
-            font-weight: 600;
-            color: #555;
-            flex-grow: 1;
-            text-align: center;
-        }
-        div.row-widget.stRadio > div > label[data-baseweb="radio"] {
-            background-color: #471470;
-            color: white;
-            border-color: #471470;
-        }
-        div.row-widget.stRadio > div > label:hover {
-            background-color: #f9f9f9;
-            border-color: #471470;
-            color: #471470;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    st.markdown(RADIO_TAB_CSS, unsafe_allow_html=True)
 
     # Navigation Options
     nav_options = ['📈 Time & Trend Analysis', '🏢 Industry & Client Breakdown', '🔻 Marketing Funnel Analysis', '🎯 Strategy & Quadrant Matrix']
@@ -473,6 +868,9 @@ with deep_dive_tab:
     
     st.markdown("---")
 
+    # Semua data per section dihitung di dalam cabang if/elif masing-masing (lazy):
+    # section yang tidak dipilih tidak menjalankan agregasi apa pun
+
     # ---------------------------------------------------------------------
     # SECTION 1: Trend & Time Series Analysis
     # ---------------------------------------------------------------------
@@ -489,20 +887,13 @@ with deep_dive_tab:
 
         # --- 1. Persiapan Data Time Series ---
         # Agregasi Bulanan
-        filtered_df['month'] = filtered_df['created_date'].dt.to_period('M')
-        monthly_trend = filtered_df.groupby('month')[['purchase_value', 'amount_spent']].sum().reset_index()
-        monthly_trend['roas'] = np.where(monthly_trend['amount_spent'] > 0, monthly_trend['purchase_value'] / monthly_trend['amount_spent'], 0)
-        monthly_trend['month_str'] = monthly_trend['month'].astype(str)
+        monthly_trend = compute_monthly_trend(filter_key, filtered_df)
 
         # Agregasi Harian
-        daily_trend = filtered_df.groupby('created_date')[['purchase_value']].sum().reset_index()
+        daily_trend = compute_daily_revenue(filter_key, filtered_df)
 
         # Seasonality Data
-        ramadhan_perf = filtered_df.groupby('is_ramadhan')[['purchase_value']].mean().reset_index()
-        ramadhan_perf['status'] = ramadhan_perf['is_ramadhan'].map({True: 'Ramadhan', False: 'Normal Days'})
-
-        weekend_perf = filtered_df.groupby('is_weekend')[['purchase_value']].mean().reset_index()
-        weekend_perf['status'] = weekend_perf['is_weekend'].map({True: 'Weekend', False: 'Weekday'})
+        ramadhan_perf, weekend_perf = compute_seasonality(filter_key, filtered_df)
 
         # --- HITUNG SUMMARY METRICS SECTION 2 ---
         # 1. Best Month
@@ -510,17 +901,19 @@ with deep_dive_tab:
         best_month_name = best_month_row['month_str']
         best_month_val = best_month_row['purchase_value']
 
-        # 2. Ramadhan Lift
-        avg_rev_ramadhan = filtered_df[filtered_df['is_ramadhan']]['purchase_value'].mean()
-        avg_rev_normal = filtered_df[~filtered_df['is_ramadhan']]['purchase_value'].mean()
+        # 2. Ramadhan Lift (reuse rata-rata dari ramadhan_perf; grup yang tidak ada -> NaN)
+        ramadhan_avg = ramadhan_perf.set_index('is_ramadhan')['purchase_value']
+        avg_rev_ramadhan = ramadhan_avg.get(True, np.nan)
+        avg_rev_normal = ramadhan_avg.get(False, np.nan)
         if avg_rev_normal > 0:
             ramadhan_lift = ((avg_rev_ramadhan - avg_rev_normal) / avg_rev_normal) * 100
         else:
             ramadhan_lift = 0
 
-        # 3. Weekend Lift
-        avg_rev_weekend = filtered_df[filtered_df['is_weekend']]['purchase_value'].mean()
-        avg_rev_weekday = filtered_df[~filtered_df['is_weekend']]['purchase_value'].mean()
+        # 3. Weekend Lift (reuse rata-rata dari weekend_perf)
+        weekend_avg = weekend_perf.set_index('is_weekend')['purchase_value']
+        avg_rev_weekend = weekend_avg.get(True, np.nan)
+        avg_rev_weekday = weekend_avg.get(False, np.nan)
         if avg_rev_weekday > 0:
             weekend_lift = ((avg_rev_weekend - avg_rev_weekday) / avg_rev_weekday) * 100
         else:
@@ -543,75 +936,66 @@ with deep_dive_tab:
         # --- 2. Visualisasi ---
 
         # B.1: Tren Bulanan Omzet & ROAS (Dual Axis)
-        fig_b1 = go.Figure()
-
-        # Bar Chart (Omzet)
-        fig_b1.add_trace(go.Bar(
-            x=monthly_trend['month_str'],
-            y=monthly_trend['purchase_value'],
-            name='Omzet (Revenue)',
-            marker_color='skyblue',
-            opacity=0.8
-        ))
-
-        # Line Chart (ROAS)
-        fig_b1.add_trace(go.Scatter(
-            x=monthly_trend['month_str'],
-            y=monthly_trend['roas'],
-            name='ROAS',
-            yaxis='y2',
-            line=dict(color='crimson', width=3),
-            mode='lines+markers'
-        ))
-
-        fig_b1.update_layout(
-            title='B.1: Tren Bulanan Omzet & ROAS (2023)',
-            xaxis_title='Bulan',
-            yaxis=dict(title='Total Omzet (Rupiah)', showgrid=False),
-            yaxis2=dict(title='ROAS (x)', overlaying='y', side='right', showgrid=False),
-            legend=dict(x=0, y=1.1, orientation='h'),
-            template='plotly_white'
+        # Figure dibangun sekali dari data=[...] + layout (tanpa add_trace/update_layout berurutan)
+        fig_b1 = go.Figure(
+            data=[
+                # Bar Chart (Omzet)
+                go.Bar(
+                    x=monthly_trend['month_str'],
+                    y=monthly_trend['purchase_value'],
+                    name='Omzet (Revenue)',
+                    marker_color='skyblue',
+                    opacity=0.8
+                ),
+                # Line Chart (ROAS)
+                go.Scatter(
+                    x=monthly_trend['month_str'],
+                    y=monthly_trend['roas'],
+                    name='ROAS',
+                    yaxis='y2',
+                    line=dict(color='crimson', width=3),
+                    mode='lines+markers'
+                )
+            ],
+            layout=dict(
+                title='B.1: Tren Bulanan Omzet & ROAS (2023)',
+                xaxis_title='Bulan',
+                yaxis=dict(title='Total Omzet (Rupiah)', showgrid=False),
+                yaxis2=dict(title='ROAS (x)', overlaying='y', side='right', showgrid=False),
+                legend=dict(x=0, y=1.1, orientation='h'),
+                margin=dict(t=80), # Ruang ekstra untuk legend horizontal di atas plot
+            )
         )
         st.plotly_chart(fig_b1, use_container_width=True)
 
         # B.2: Tren Harian (Daily Revenue) dengan Highlight Ramadhan & Anomaly
         # --- ANOMALY DETECTION LOGIC (TAB 2) ---
-        try:
-            if len(daily_trend) > 7:
-                daily_trend['rolling_mean'] = daily_trend['purchase_value'].rolling(window=7).mean()
-                daily_trend['rolling_std'] = daily_trend['purchase_value'].rolling(window=7).std()
-                daily_trend['is_anomaly'] = ((daily_trend['purchase_value'] > (daily_trend['rolling_mean'] + 2 * daily_trend['rolling_std'])) | 
-                                             (daily_trend['purchase_value'] < (daily_trend['rolling_mean'] - 2 * daily_trend['rolling_std'])))
-                anomalies_b2 = daily_trend[daily_trend['is_anomaly']]
-            else:
-                anomalies_b2 = pd.DataFrame()
-        except Exception:
+        if len(daily_trend) > 7:
+            daily_trend['is_anomaly'] = rolling_anomaly(daily_trend['purchase_value'].to_numpy())
+            anomalies_b2 = daily_trend[daily_trend['is_anomaly']]
+        else:
             anomalies_b2 = pd.DataFrame()
 
-        fig_b2 = px.line(
-            daily_trend, 
-            x='created_date', 
-            y='purchase_value', 
-            title='B.2: Tren Omzet Harian (with Anomaly Detection)',
-            labels={'purchase_value': 'Omzet Harian', 'created_date': 'Tanggal'},
-            line_shape='linear'
-        )
-        fig_b2.update_traces(line_color='seagreen')
-
-        # Highlight Ramadhan Area
-        ramadhan_start = pd.Timestamp('2023-03-22')
-        ramadhan_end = pd.Timestamp('2023-04-21')
+        # Rentang panjang di-downsample (LTTB) sebelum dikirim ke browser; anomali tetap resolusi penuh
+        if len(daily_trend) > LTTB_THRESHOLD:
+            keep = lttb_indices(daily_trend['created_date'].to_numpy(dtype='datetime64[ns]').view('i8'), daily_trend['purchase_value'], LTTB_POINTS)
+            daily_trend_plot = daily_trend.iloc[keep]
+        else:
+            daily_trend_plot = daily_trend
+
+        b2_traces = [go.Scattergl(
+            x=daily_trend_plot['created_date'],
+            y=daily_trend_plot['purchase_value'],
+            mode='lines',
+            name='',
+            showlegend=False,
+            line=dict(color='seagreen', shape='linear'),
+            hovertemplate='Tanggal=%{x}<br>Omzet Harian=%{y}<extra></extra>'
+        )]
 
-        fig_b2.add_vrect(
-            x0=ramadhan_start, x1=ramadhan_end, 
-            fillcolor="orange", opacity=0.2, 
-            layer="below", line_width=0,
-            annotation_text="Ramadhan", annotation_position="top left"
-        )
-        
         # Add Anomaly Markers
         if not anomalies_b2.empty:
-            fig_b2.add_trace(go.Scatter(
+            b2_traces.append(go.Scattergl(
                 x=anomalies_b2['created_date'],
                 y=anomalies_b2['purchase_value'],
                 mode='markers',
@@ -620,38 +1004,67 @@ with deep_dive_tab:
                 text=['Anomaly Detected'] * len(anomalies_b2),
                 hoverinfo='text+x+y'
             ))
-            
+
+        # Highlight Ramadhan Area (vrect + label ditulis langsung sebagai shape/annotation layout)
+        ramadhan_start = pd.Timestamp('2023-03-22')
+        ramadhan_end = pd.Timestamp('2023-04-21')
+
+        fig_b2 = go.Figure(
+            data=b2_traces,
+            layout=dict(
+                title='B.2: Tren Omzet Harian (with Anomaly Detection)',
+                xaxis_title='Tanggal',
+                yaxis_title='Omzet Harian',
+                shapes=[dict(
+                    type='rect', xref='x', yref='y domain',
+                    x0=ramadhan_start, x1=ramadhan_end, y0=0, y1=1,
+                    fillcolor="orange", opacity=0.2,
+                    layer="below", line_width=0
+                )],
+                annotations=[dict(
+                    text="Ramadhan", showarrow=False,
+                    xref='x', yref='y domain', x=ramadhan_start, y=1,
+                    xanchor='left', yanchor='top'
+                )]
+            )
+        )
+
         st.plotly_chart(fig_b2, use_container_width=True)
 
         # B.3: Seasonality Impact (Side by Side)
         col_season1, col_season2 = st.columns(2)
 
+        # Frame seasonality hanya 2 baris: go.Bar langsung, tanpa overhead validasi/reshape px
         # Efek Ramadhan
-        fig_ramadhan = px.bar(
-            ramadhan_perf, 
-            x='status', 
-            y='purchase_value', 
+        fig_ramadhan = go.Figure(go.Bar(
+            x=ramadhan_perf['status'],
+            y=ramadhan_perf['purchase_value'],
+            marker_color=ramadhan_perf['status'].map({'Normal Days': 'gray', 'Ramadhan': 'orange'}),
+            texttemplate='%{y:.2s}',
+            hovertemplate='status=%{x}<br>purchase_value=%{y}<extra></extra>'
+        ))
+        fig_ramadhan.update_layout(
             title='Efek Ramadhan (Avg Omzet Harian)',
-            color='status',
-            color_discrete_map={'Normal Days': 'gray', 'Ramadhan': 'orange'},
-            template='plotly_white',
-            text_auto='.2s'
+            xaxis_title='status',
+            yaxis_title='purchase_value',
+            showlegend=False
         )
-        fig_ramadhan.update_layout(showlegend=False)
         col_season1.plotly_chart(fig_ramadhan, use_container_width=True)
 
         # Efek Weekend
-        fig_weekend = px.bar(
-            weekend_perf, 
-            x='status', 
-            y='purchase_value', 
+        fig_weekend = go.Figure(go.Bar(
+            x=weekend_perf['status'],
+            y=weekend_perf['purchase_value'],
+            marker_color=weekend_perf['status'].map({'Weekday': 'lightblue', 'Weekend': 'navy'}),
+            texttemplate='%{y:.2s}',
+            hovertemplate='status=%{x}<br>purchase_value=%{y}<extra></extra>'
+        ))
+        fig_weekend.update_layout(
             title='Efek Weekend (Avg Omzet Harian)',
-            color='status',
-            color_discrete_map={'Weekday': 'lightblue', 'Weekend': 'navy'},
-            template='plotly_white',
-            text_auto='.2s'
+            xaxis_title='status',
+            yaxis_title='purchase_value',
+            showlegend=False
         )
-        fig_weekend.update_layout(showlegend=False)
         col_season2.plotly_chart(fig_weekend, use_container_width=True)
         
 
@@ -671,35 +1084,25 @@ with deep_dive_tab:
 
         # --- PREPARE DATA SECTION 3 ---
         # C.1 & C.3: Analisis Per Industri
-        # Agregasi Sum dan Mean
-        industry_perf = filtered_df.groupby('industry')[['purchase_value', 'amount_spent']].agg(['sum', 'mean']).reset_index()
-        # Flatten Columns
-        industry_perf.columns = ['industry', 'total_revenue', 'avg_daily_revenue', 'total_spend', 'avg_daily_spend']
-        # Hitung ROAS
-        industry_perf['roas'] = np.where(industry_perf['total_spend'] > 0, industry_perf['total_revenue'] / industry_perf['total_spend'], 0)
-
-        # Sorting
-        industry_sorted_rev = industry_perf.sort_values('total_revenue', ascending=False)
-        industry_sorted_roas = industry_perf.sort_values('roas', ascending=False)
+        industry_perf = compute_industry_perf(filter_key, filtered_df)
 
         # C.2: Analisis Per Akun Klien
-        client_perf = filtered_df.groupby(['client_name', 'industry'])[['purchase_value', 'amount_spent']].sum().reset_index()
-        client_perf['roas'] = np.where(client_perf['amount_spent'] > 0, client_perf['purchase_value'] / client_perf['amount_spent'], 0)
-        client_top_rev = client_perf.sort_values('purchase_value', ascending=False)
+        client_perf = compute_client_perf(filter_key, filtered_df)
 
         # --- HITUNG SUMMARY METRICS SECTION 3 ---
+        # Baris teratas cukup diambil via idxmax (O(n)), tanpa sort penuh
         # 1. Winning Industry
-        winning_ind_row = industry_sorted_rev.iloc[0]
+        winning_ind_row = industry_perf.loc[industry_perf['total_revenue'].idxmax()]
         winning_ind_name = winning_ind_row['industry']
         winning_ind_val = winning_ind_row['total_revenue']
 
         # 2. Hero Account
-        hero_client_row = client_top_rev.iloc[0]
+        hero_client_row = client_perf.loc[client_perf['purchase_value'].idxmax()]
         hero_client_name = hero_client_row['client_name']
         hero_client_val = hero_client_row['purchase_value']
 
         # 3. Most Efficient Industry
-        efficient_ind_row = industry_sorted_roas.iloc[0]
+        efficient_ind_row = industry_perf.loc[industry_perf['roas'].idxmax()]
         efficient_ind_name = efficient_ind_row['industry']
         efficient_ind_roas = efficient_ind_row['roas']
 
@@ -713,44 +1116,54 @@ with deep_dive_tab:
         col_ind1, col_ind2 = st.columns(2)
 
         # C.1: Total Revenue per Industri (Bar Chart)
-        fig_c1 = px.bar(
-            industry_sorted_rev,
-            x='industry',
-            y='total_revenue',
+        # Satu trace go.Bar (satu bar per industri), warna per bar lewat marker_color
+        # Warna Pastel mengikuti peringkat omzet (rank), sama seperti urutan bar 'total descending'
+        pastel = px.colors.qualitative.Pastel # Mimic soft colors
+        revenue_rank = industry_perf['total_revenue'].rank(method='first', ascending=False).astype(int) - 1
+        fig_c1 = go.Figure(go.Bar(
+            x=industry_perf['industry'],
+            y=industry_perf['total_revenue'],
+            marker_color=[pastel[r % len(pastel)] for r in revenue_rank],
+            texttemplate='%{y:.2s}',
+            hovertemplate='industry=%{x}<br>total_revenue=%{y}<extra></extra>'
+        ))
+        fig_c1.update_layout(
             title="C.1: Total Omzet per Industri (Winning Industry)",
-            text_auto='.2s',
-            template="plotly_white",
-            color='industry',
-            color_discrete_sequence=px.colors.qualitative.Pastel # Mimic soft colors
+            xaxis={'title': 'industry', 'categoryorder': 'total descending'},
+            yaxis_title="Total Revenue (Rupiah)"
         )
-        fig_c1.update_traces(showlegend=False)
-        fig_c1.update_layout(yaxis_title="Total Revenue (Rupiah)")
         col_ind1.plotly_chart(fig_c1, use_container_width=True)
 
         # C.3: Efisiensi Iklan (ROAS) per Industri (Bar Chart)
-        fig_c3 = px.bar(
-            industry_sorted_roas,
-            x='industry',
-            y='roas',
+        # Gradasi hijau mengikuti peringkat ROAS (rank), urutan bar lewat categoryorder -> tanpa sort
+        greens = ['green', 'limegreen', 'lightgreen'] # Custom green palette logic approximation
+        roas_rank = industry_perf['roas'].rank(method='first', ascending=False).astype(int) - 1
+        fig_c3 = go.Figure(go.Bar(
+            x=industry_perf['industry'],
+            y=industry_perf['roas'],
+            marker_color=[greens[r % len(greens)] for r in roas_rank],
+            texttemplate='%{y:.2f}',
+            hovertemplate='industry=%{x}<br>roas=%{y}<extra></extra>'
+        ))
+        fig_c3.update_layout(
             title="C.3: Efisiensi Iklan (ROAS) per Industri",
-            text_auto='.2f',
-            template="plotly_white",
-            color='industry',
-            color_discrete_sequence=['green', 'limegreen', 'lightgreen'] # Custom green palette logic approximation
+            xaxis={'title': 'industry', 'categoryorder': 'total descending'},
+            yaxis_title="ROAS (x)"
         )
-        fig_c3.update_traces(showlegend=False)
-        fig_c3.update_layout(yaxis_title="ROAS (x)")
         col_ind2.plotly_chart(fig_c3, use_container_width=True)
 
         # C.2: Peringkat Klien Berdasarkan Omzet (Bar Chart Colored by Industry)
+        # Warna & legend industri dipatok ke urutan kemunculan di peringkat omzet klien (klien teratas ->
+        # warna pertama), bukan urutan baris client_perf; urutan bar tetap lewat categoryorder
+        industry_color_order = client_perf.sort_values('purchase_value', ascending=False, kind='stable')['industry'].unique().tolist()
         fig_c2 = px.bar(
-            client_top_rev,
+            client_perf,
             x='client_name',
             y='purchase_value',
             color='industry', # Hue equivalent
+            category_orders={'industry': industry_color_order},
             title="C.2: Peringkat Klien Berdasarkan Omzet",
             text_auto='.2s',
-            template="plotly_white",
             labels={'purchase_value': 'Total Revenue', 'client_name': 'Klien'}
         )
         fig_c2.update_layout(xaxis={'categoryorder': 'total descending'})
@@ -773,7 +1186,10 @@ with deep_dive_tab:
         """)
 
         # Prepare Data for Treemap (Ensure consistent data source)
-        treemap_data = client_perf.copy()
+        # Presisi float32 cukup untuk hover/warna dan memperkecil payload JSON ke browser
+        treemap_data = client_perf[['industry', 'client_name', 'purchase_value', 'amount_spent', 'roas']].copy()
+        for col in ('purchase_value', 'amount_spent', 'roas'):
+            treemap_data[col] = treemap_data[col].astype('float32')
         
         # Create Treemap
         fig_treemap = px.treemap(
@@ -785,11 +1201,10 @@ with deep_dive_tab:
             color_continuous_midpoint=treemap_data['roas'].mean(), # Center color scale at average
             title="<b>Market Map:</b> Revenue (Size) & Efficiency (Color) Distribution",
             hover_data={'purchase_value': ':,.0f', 'roas': ':.2f', 'amount_spent': ':,.0f'},
-            template="plotly_white"
         )
         
         fig_treemap.update_traces(textinfo="label+value+percent entry")
-        fig_treemap.update_layout(margin=dict(t=50, l=25, r=25, b=25), height=600)
+        fig_treemap.update_layout(height=600)
         
         st.plotly_chart(fig_treemap, use_container_width=True)
 
@@ -813,15 +1228,17 @@ with deep_dive_tab:
         """)
 
         # 1. Prepare Funnel Data
-        # Check if 'add_to_cart' exists in columns, if not use 0
-        atc_val = filtered_df['add_to_cart'].sum() if 'add_to_cart' in filtered_df.columns else 0
+        # Semua tahap di-sum dalam satu panggilan; check if 'add_to_cart' exists in columns, if not use 0
+        funnel_cols = ['impressions', 'clicks', 'purchase'] + (['add_to_cart'] if 'add_to_cart' in filtered_df.columns else [])
+        funnel_sums = filtered_df[funnel_cols].sum()
+        atc_val = funnel_sums.get('add_to_cart', 0)
         
         funnel_data = dict(
             number=[
-                filtered_df['impressions'].sum(),
-                filtered_df['clicks'].sum(),
+                funnel_sums['impressions'],
+                funnel_sums['clicks'],
                 atc_val,
-                filtered_df['purchase'].sum()
+                funnel_sums['purchase']
             ],
             stage=["Impressions (Views)", "Clicks (Traffic)", "Add to Cart (Intent)", "Purchase (Sales)"]
         )
@@ -836,7 +1253,6 @@ with deep_dive_tab:
                 x='number', 
                 y='stage', 
                 title="<b>Marketing Conversion Funnel</b>",
-                template="plotly_white",
                 color='stage',
                 color_discrete_sequence=px.colors.qualitative.Safe
             )
@@ -879,67 +1295,81 @@ with deep_dive_tab:
         """)
 
         # --- 1. Persiapan Data untuk Quadrant Analysis ---
-        client_matrix = filtered_df.groupby('client_name')[['purchase_value', 'amount_spent']].sum().reset_index()
-        client_matrix['roas'] = np.where(client_matrix['amount_spent'] > 0, client_matrix['purchase_value'] / client_matrix['amount_spent'], 0)
-
-        # Thresholds
-        avg_roas_client = client_matrix['roas'].mean()
-        avg_spend_client = client_matrix['amount_spent'].mean()
-
-        # --- 2. Simulasi Realokasi Budget ---
-        # Hitung Traffic Spend
-        traffic_spend = filtered_df[filtered_df['campaign_objective'] == 'Traffic']['amount_spent'].sum()
-
-        # Benchmark ROAS Sales (Dynamic from current filter)
-        sales_only_data = filtered_df[filtered_df['campaign_objective'] == 'Sales']
-        if not sales_only_data.empty and sales_only_data['amount_spent'].sum() > 0:
-            sales_roas_benchmark = sales_only_data['purchase_value'].sum() / sales_only_data['amount_spent'].sum()
-        else:
-            sales_roas_benchmark = 1.62 # Fallback to global average/hardcoded if no sales data
-
-        # --- TAMPILKAN EXECUTIVE SUMMARY (SIMULASI) ---
-        st.subheader("Simulasi Strategi: Re-alokasi Budget Traffic ke Sales")
+        client_matrix = compute_client_matrix(filter_key, filtered_df)
+
+        # Skalar simulasi di-memo di session_state per filter_key: rerun yang tidak mengubah filter
+        # (ganti section, interaksi widget) hanya membaca angka, tanpa scan pandas ulang
+        sim_scalars = st.session_state.get('sim_scalars')
+        if sim_scalars is None or sim_scalars['filter_key'] != filter_key:
+            # Thresholds
+            avg_roas_client = client_matrix['roas'].mean()
+            avg_spend_client = client_matrix['amount_spent'].mean()
+
+            # --- 2. Simulasi Realokasi Budget ---
+            # Satu groupby per objective menggantikan dua filter + empat sum
+            obj_agg = filtered_df.groupby('campaign_objective', observed=True)[['purchase_value', 'amount_spent']].sum()
+
+            # Hitung Traffic Spend
+            traffic_spend = obj_agg.loc['Traffic', 'amount_spent'] if 'Traffic' in obj_agg.index else 0
+
+            # Benchmark ROAS Sales (Dynamic from current filter)
+            if 'Sales' in obj_agg.index and obj_agg.loc['Sales', 'amount_spent'] > 0:
+                sales_roas_benchmark = obj_agg.loc['Sales', 'purchase_value'] / obj_agg.loc['Sales', 'amount_spent']
+            else:
+                sales_roas_benchmark = 1.62 # Fallback to global average/hardcoded if no sales data
+
+            total_spend_global, current_total_rev = compute_sim_baseline(filter_key, filtered_df)
+
+            sim_scalars = {
+                'filter_key': filter_key,
+                'avg_roas_client': avg_roas_client,
+                'avg_spend_client': avg_spend_client,
+                'traffic_spend': traffic_spend,
+                'sales_roas_benchmark': sales_roas_benchmark,
+                'current_total_rev': current_total_rev,
+                # Total Spend stays same (just shifted)
+                'total_spend_global': total_spend_global,
+            }
+            st.session_state['sim_scalars'] = sim_scalars
+
+        avg_roas_client = sim_scalars['avg_roas_client']
+        avg_spend_client = sim_scalars['avg_spend_client']
+
+        # Simulator dibungkus st.fragment: interaksi slider hanya me-rerun fragment ini,
+        # bukan seluruh tab (agregasi & chart lain tidak dihitung ulang)
+        @st.fragment
+        def traffic_to_sales_simulator():
+            sim = st.session_state['sim_scalars']
+            traffic_spend = sim['traffic_spend']
+            sales_roas_benchmark = sim['sales_roas_benchmark']
+            current_total_rev = sim['current_total_rev']
+
+            # --- TAMPILKAN EXECUTIVE SUMMARY (SIMULASI) ---
+            st.subheader("Simulasi Strategi: Re-alokasi Budget Traffic ke Sales")
         
-        # Interactive Slider
-        reallocation_pct = st.slider("Geser untuk menentukan % Budget Traffic yang akan dipindahkan:", 
-                                     min_value=0, max_value=100, value=50, step=5)
+            # Interactive Slider
+            reallocation_pct = st.slider("Geser untuk menentukan % Budget Traffic yang akan dipindahkan:", 
+                                         min_value=0, max_value=100, value=50, step=5)
         
-        # Simulasi Dinamis
-        budget_moved = traffic_spend * (reallocation_pct / 100)
-        potential_revenue_gain = budget_moved * sales_roas_benchmark
-        current_total_rev = filtered_df['purchase_value'].sum()
-        projected_growth_pct = (potential_revenue_gain / current_total_rev * 100) if current_total_rev > 0 else 0
+            # Simulasi Dinamis
+            budget_moved = traffic_spend * (reallocation_pct / 100)
+            potential_revenue_gain = budget_moved * sales_roas_benchmark
+            projected_growth_pct = (potential_revenue_gain / current_total_rev * 100) if current_total_rev > 0 else 0
+
+            col_sim1, col_sim2, col_sim3, col_sim4 = st.columns(4)
 
-        col_sim1, col_sim2, col_sim3, col_sim4 = st.columns(4)
+            col_sim1.metric("Traffic Budget (Potential Saving)", format_idr(traffic_spend))
+            col_sim2.metric(f"Proposed Shift ({reallocation_pct}%)", format_idr(budget_moved))
+            col_sim3.metric("Est. Revenue Gain", format_idr(potential_revenue_gain), f"ROAS {sales_roas_benchmark:.2f}x")
+            col_sim4.metric("Projected Growth", f"+{projected_growth_pct:.2f}%")
 
-        col_sim1.metric("Traffic Budget (Potential Saving)", format_idr(traffic_spend))
-        col_sim2.metric(f"Proposed Shift ({reallocation_pct}%)", format_idr(budget_moved))
-        col_sim3.metric("Est. Revenue Gain", format_idr(potential_revenue_gain), f"ROAS {sales_roas_benchmark:.2f}x")
-        col_sim4.metric("Projected Growth", f"+{projected_growth_pct:.2f}%")
+        traffic_to_sales_simulator()
 
         st.markdown("---")
 
         # --- 3. Visualisasi Quadrant Analysis (Plotly) ---
-        # Prepare Plotly Figure
-        fig_quadrant = px.scatter(
-            client_matrix,
-            x='amount_spent',
-            y='roas',
-            text='client_name',
-            size='amount_spent', # Bubble size
-            color='client_name', # Color by client for aesthetics
-            title="<b>Client Performance Matrix: Spend vs ROAS</b>",
-            labels={'amount_spent': 'Total Ad Spend (IDR)', 'roas': 'ROAS (x)'},
-            template='plotly_white',
-            hover_data={'purchase_value': True, 'amount_spent': ':.2s', 'roas': ':.2f'}
-        )
-
-        fig_quadrant.update_traces(
-            textposition='top center',
-            textfont=dict(size=11, family="Arial", color='black'),
-            marker=dict(opacity=0.9, line=dict(width=1, color='White'), sizemode='area', sizeref=2.*max(client_matrix['amount_spent'])/(60.**2)) # Adjust bubble scaling
-        )
-
+        # Prepare Plotly Figure (salinan float32 khusus untuk payload chart; client_matrix tetap utuh untuk simulator)
+        quadrant_data = client_matrix.astype({'purchase_value': 'float32', 'amount_spent': 'float32', 'roas': 'float32'})
         # Determine Axis Limits for Shapes (Add padding for aesthetics)
         # Use dynamic ranges instead of starting from 0 to focus on the spread
         x_max = client_matrix['amount_spent'].max() * 1.15
@@ -947,45 +1377,45 @@ with deep_dive_tab:
         x_min = client_matrix['amount_spent'].min() * 0.85
         y_min = client_matrix['roas'].min() * 0.85
 
-        fig_quadrant.update_layout(
-            xaxis_range=[x_min, x_max], 
-            yaxis_range=[y_min, y_max],
-            showlegend=False, # Hide legend to keep it clean, names are on bubbles
-            height=600, # Taller canvas
-            title_font=dict(size=20),
-            xaxis=dict(showgrid=True, gridcolor='#f0f0f0'),
-            yaxis=dict(showgrid=True, gridcolor='#f0f0f0')
-        )
-
-        # Add Quadrant Backgrounds (Shapes) - Softer Pastel Palette
-        # 1. STAR (Top Right) - Soft Green
-        fig_quadrant.add_shape(type="rect",
-            x0=avg_spend_client, y0=avg_roas_client, x1=x_max, y1=y_max,
-            fillcolor="#e8f5e9", opacity=0.6, layer="below", line_width=0,
-        )
-        # 2. ALERT (Bottom Right) - Soft Red
-        fig_quadrant.add_shape(type="rect",
-            x0=avg_spend_client, y0=y_min, x1=x_max, y1=avg_roas_client,
-            fillcolor="#ffebee", opacity=0.6, layer="below", line_width=0,
-        )
-        # 3. POTENTIAL (Top Left) - Soft Orange/Yellow
-        fig_quadrant.add_shape(type="rect",
-            x0=x_min, y0=avg_roas_client, x1=avg_spend_client, y1=y_max,
-            fillcolor="#fff8e1", opacity=0.6, layer="below", line_width=0,
-        )
-        # 4. LOW PRIORITY (Bottom Left) - Soft Grey
-        fig_quadrant.add_shape(type="rect",
-            x0=x_min, y0=y_min, x1=avg_spend_client, y1=avg_roas_client,
-            fillcolor="#f5f5f5", opacity=0.6, layer="below", line_width=0,
+        # Satu trace Scattergl untuk semua klien (bukan satu trace per klien); warna per klien lewat array
+        client_colors = px.colors.qualitative.Plotly # Color by client for aesthetics
+        quadrant_trace = go.Scattergl(
+            x=quadrant_data['amount_spent'],
+            y=quadrant_data['roas'],
+            mode='markers+text',
+            text=quadrant_data['client_name'],
+            customdata=quadrant_data[['purchase_value']],
+            hovertemplate='client_name=%{text}<br>Total Ad Spend (IDR)=%{x:.2s}<br>ROAS (x)=%{y:.2f}<br>purchase_value=%{customdata[0]}<extra></extra>',
+            textposition='top center',
+            textfont=dict(size=11, family="Arial", color='black'),
+            marker=dict(
+                size=quadrant_data['amount_spent'], # Bubble size
+                color=[client_colors[i % len(client_colors)] for i in range(len(quadrant_data))],
+                opacity=0.9, line=dict(width=1, color='White'),
+                sizemode='area', sizeref=2.*max(client_matrix['amount_spent'])/(60.**2) # Adjust bubble scaling
+            )
         )
 
-        # Add Threshold Lines (Sleeker Look)
-        fig_quadrant.add_hline(y=avg_roas_client, line_dash="dot", line_color="#555", line_width=2, annotation_text=f"Avg ROAS: {avg_roas_client:.2f}", annotation_position="bottom left")
-        fig_quadrant.add_vline(x=avg_spend_client, line_dash="dot", line_color="#555", line_width=2, annotation_text="Avg Spend", annotation_position="top left")
+        # Quadrant Backgrounds (Shapes) - Softer Pastel Palette
+        def quadrant_rect(x0, y0, x1, y1, fillcolor):
+            return dict(type="rect", x0=x0, y0=y0, x1=x1, y1=y1,
+                        fillcolor=fillcolor, opacity=0.6, layer="below", line_width=0)
+
+        # Threshold Lines (Sleeker Look)
+        threshold_line = dict(type="line", line=dict(color="#555", dash="dot", width=2))
+
+        quadrant_shapes = [
+            quadrant_rect(avg_spend_client, avg_roas_client, x_max, y_max, "#e8f5e9"), # 1. STAR (Top Right) - Soft Green
+            quadrant_rect(avg_spend_client, y_min, x_max, avg_roas_client, "#ffebee"), # 2. ALERT (Bottom Right) - Soft Red
+            quadrant_rect(x_min, avg_roas_client, avg_spend_client, y_max, "#fff8e1"), # 3. POTENTIAL (Top Left) - Soft Orange/Yellow
+            quadrant_rect(x_min, y_min, avg_spend_client, avg_roas_client, "#f5f5f5"), # 4. LOW PRIORITY (Bottom Left) - Soft Grey
+            dict(threshold_line, xref="x domain", x0=0, x1=1, yref="y", y0=avg_roas_client, y1=avg_roas_client),
+            dict(threshold_line, xref="x", x0=avg_spend_client, x1=avg_spend_client, yref="y domain", y0=0, y1=1),
+        ]
 
-        # Add Quadrant Labels (Styled Annotations)
-        def add_quadrant_label(x, y, text, color):
-            fig_quadrant.add_annotation(
+        # Quadrant Labels (Styled Annotations)
+        def quadrant_label(x, y, text, color):
+            return dict(
                 x=x, y=y, 
                 text=text, 
                 showarrow=False, 
@@ -997,10 +1427,29 @@ with deep_dive_tab:
                 align="center"
             )
 
-        add_quadrant_label(x_max*0.9, y_max*0.95, "STAR CLIENT\n(Scale Up)", "green")
-        add_quadrant_label(x_max*0.9, y_min+(y_max*0.1), "ALERT / FIX\n(Optimize)", "#d32f2f") # Darker red for text
-        add_quadrant_label(x_max*0.15, y_max*0.95, "POTENTIAL\n(Experiment)", "#f57c00") # Darker orange for text
-        add_quadrant_label(x_max*0.15, y_min+(y_max*0.1), "LOW PRIORITY\n(Monitor)", "grey")
+        quadrant_annotations = [
+            dict(text=f"Avg ROAS: {avg_roas_client:.2f}", showarrow=False, xref="x domain", x=0, yref="y", y=avg_roas_client, xanchor="left", yanchor="top"),
+            dict(text="Avg Spend", showarrow=False, xref="x", x=avg_spend_client, yref="y domain", y=1, xanchor="right", yanchor="top"),
+            quadrant_label(x_max*0.9, y_max*0.95, "STAR CLIENT\n(Scale Up)", "green"),
+            quadrant_label(x_max*0.9, y_min+(y_max*0.1), "ALERT / FIX\n(Optimize)", "#d32f2f"), # Darker red for text
+            quadrant_label(x_max*0.15, y_max*0.95, "POTENTIAL\n(Experiment)", "#f57c00"), # Darker orange for text
+            quadrant_label(x_max*0.15, y_min+(y_max*0.1), "LOW PRIORITY\n(Monitor)", "grey"),
+        ]
+
+        # Figure dibangun sekali: trace, shapes, dan annotations langsung di konstruktor
+        fig_quadrant = go.Figure(
+            data=[quadrant_trace],
+            layout=dict(
+                title="<b>Client Performance Matrix: Spend vs ROAS</b>",
+                title_font=dict(size=20),
+                xaxis=dict(title='Total Ad Spend (IDR)', range=[x_min, x_max], showgrid=True),
+                yaxis=dict(title='ROAS (x)', range=[y_min, y_max], showgrid=True),
+                showlegend=False, # Hide legend to keep it clean, names are on bubbles
+                height=600, # Taller canvas
+                shapes=quadrant_shapes,
+                annotations=quadrant_annotations
+            )
+        )
 
         st.plotly_chart(fig_quadrant, use_container_width=True)
         
@@ -1010,114 +1459,99 @@ with deep_dive_tab:
         st.subheader("🔀 Simulator Tingkat Lanjut: Realokasi Antar Klien")
         st.markdown("Gunakan alat ini untuk memindahkan budget dari **Klien Boros (ROAS Rendah)** ke **Klien Potensial (ROAS Tinggi)**.")
         
-        sim_col1, sim_col2, sim_col3 = st.columns(3)
+        @st.fragment
+        def client_reallocation_simulator(client_idx):
+            sim = st.session_state['sim_scalars']
+            current_total_rev = sim['current_total_rev']
+            total_spend_global = sim['total_spend_global']
+
+            sim_col1, sim_col2, sim_col3 = st.columns(3)
         
-        # 1. Pilih Source (Asal Dana)
-        with sim_col1:
-            # Sort clients by ROAS ascending (Lowest ROAS first - candidates for cut)
-            client_roas_sorted = client_matrix.sort_values('roas', ascending=True)
-            source_client = st.selectbox("Ambil Budget Dari (Source):", client_roas_sorted['client_name'].unique())
+            # 1. Pilih Source (Asal Dana)
+            with sim_col1:
+                # Sort clients by ROAS ascending (Lowest ROAS first - candidates for cut)
+                client_roas_sorted = client_idx['roas'].sort_values(ascending=True)
+                source_client = st.selectbox("Ambil Budget Dari (Source):", client_roas_sorted.index.tolist())
             
-            source_data = client_matrix[client_matrix['client_name'] == source_client].iloc[0]
-            st.caption(f"ROAS Saat Ini: **{source_data['roas']:.2f}x** | Spend: {format_idr(source_data['amount_spent'])}")
+                source_data = client_idx.loc[source_client]
+                st.caption(f"ROAS Saat Ini: **{source_data['roas']:.2f}x** | Spend: {format_idr(source_data['amount_spent'])}")
             
-        # 2. Pilih Target (Tujuan Dana)
-        with sim_col2:
-            # Sort clients by ROAS descending (Highest ROAS first - candidates for boost)
-            client_roas_desc = client_matrix.sort_values('roas', ascending=False)
-            # Exclude selected source
-            target_opts = [c for c in client_roas_desc['client_name'].unique() if c != source_client]
-            target_client = st.selectbox("Pindahkan Ke (Target):", target_opts)
+            # 2. Pilih Target (Tujuan Dana)
+            with sim_col2:
+                # Sort clients by ROAS descending (Highest ROAS first - candidates for boost)
+                client_roas_desc = client_idx['roas'].sort_values(ascending=False)
+                # Exclude selected source
+                target_opts = [c for c in client_roas_desc.index if c != source_client]
+                target_client = st.selectbox("Pindahkan Ke (Target):", target_opts)
             
-            if target_client:
-                target_data = client_matrix[client_matrix['client_name'] == target_client].iloc[0]
-                st.caption(f"ROAS Saat Ini: **{target_data['roas']:.2f}x** | Spend: {format_idr(target_data['amount_spent'])}")
-            else:
-                target_data = None
-
-        # 3. Tentukan Nominal / Persentase
-        with sim_col3:
-            transfer_pct = st.slider("Persentase Budget Source yg Dipindah:", 0, 100, 20, 5)
-            transfer_amount = source_data['amount_spent'] * (transfer_pct / 100)
-            st.caption(f"Nominal Dipindah: **{format_idr(transfer_amount)}**")
-
-        # 4. Hitung Dampak (Impact Calculation)
-        if target_client:
-            # Revenue Lost from Source
-            rev_lost = transfer_amount * source_data['roas']
-            # Revenue Gained from Target (Assume Linear Growth with Target's ROAS)
-            rev_gained = transfer_amount * target_data['roas']
+                if target_client:
+                    target_data = client_idx.loc[target_client]
+                    st.caption(f"ROAS Saat Ini: **{target_data['roas']:.2f}x** | Spend: {format_idr(target_data['amount_spent'])}")
+                else:
+                    target_data = None
+
+            # 3. Tentukan Nominal / Persentase
+            with sim_col3:
+                transfer_pct = st.slider("Persentase Budget Source yg Dipindah:", 0, 100, 20, 5)
+                transfer_amount = source_data['amount_spent'] * (transfer_pct / 100)
+                st.caption(f"Nominal Dipindah: **{format_idr(transfer_amount)}**")
+
+            # 4. Hitung Dampak (Impact Calculation)
+            # Nominal 0 tidak mengubah apa pun: lewati kalkulasi & kartu hasil.
+            # Bedakan source tanpa spend (tidak ada budget untuk dipindah) dari slider di 0%.
+            if target_client and source_data['amount_spent'] == 0:
+                st.info(f"**{source_client}** tidak memiliki spend pada filter ini, jadi tidak ada budget yang bisa dipindahkan. Pilih klien source lain.")
+            elif target_client and transfer_amount == 0:
+                st.info("Geser slider untuk mensimulasikan pemindahan budget.")
+            elif target_client:
+                # Revenue Lost from Source
+                rev_lost = transfer_amount * source_data['roas']
+                # Revenue Gained from Target (Assume Linear Growth with Target's ROAS)
+                rev_gained = transfer_amount * target_data['roas']
             
-            net_revenue_impact = rev_gained - rev_lost
+                net_revenue_impact = rev_gained - rev_lost
             
-            # Global Metrics Update
-            new_total_rev = current_total_rev + net_revenue_impact
-            # Total Spend stays same (just shifted)
-            total_spend_global = filtered_df['amount_spent'].sum()
+                # Global Metrics Update
+                new_total_rev = current_total_rev + net_revenue_impact
+                old_global_roas, new_global_roas = safe_roas([current_total_rev, new_total_rev], total_spend_global)
             
-            old_global_roas = current_total_rev / total_spend_global if total_spend_global > 0 else 0
-            new_global_roas = new_total_rev / total_spend_global if total_spend_global > 0 else 0
+                # Display Results
+                st.markdown("#### 📊 Proyeksi Dampak Bisnis:")
+                res1, res2, res3 = st.columns(3)
             
-            # Display Results
-            st.markdown("#### 📊 Proyeksi Dampak Bisnis:")
-            res1, res2, res3 = st.columns(3)
+                res1.metric(
+                    "Net Revenue Impact", 
+                    format_idr(net_revenue_impact), 
+                    delta="Positif" if net_revenue_impact > 0 else "Negatif"
+                )
             
-            res1.metric(
-                "Net Revenue Impact", 
-                format_idr(net_revenue_impact), 
-                delta="Positif" if net_revenue_impact > 0 else "Negatif"
-            )
+                res2.metric(
+                    "Old ROAS (Global)", 
+                    f"{old_global_roas:.2f}x"
+                )
             
-            res2.metric(
-                "Old ROAS (Global)", 
-                f"{old_global_roas:.2f}x"
-            )
+                res3.metric(
+                    "New ROAS (Global)", 
+                    f"{new_global_roas:.2f}x",
+                    delta=f"{(new_global_roas - old_global_roas):.3f} pts"
+                )
             
-            res3.metric(
-                "New ROAS (Global)", 
-                f"{new_global_roas:.2f}x",
-                delta=f"{(new_global_roas - old_global_roas):.3f} pts"
-            )
-            
-            if net_revenue_impact > 0:
-                st.success(f"✅ **Rekomendasi:** Strategi ini MENGUNTUNGKAN. Anda mendapatkan tambahan omzet **{format_idr(net_revenue_impact)}** hanya dengan memindahkan budget.")
-            else:
-                st.error(f"⚠️ **Peringatan:** Strategi ini MERUGIKAN. Jangan pindahkan budget ke klien dengan ROAS lebih rendah.")
+                if net_revenue_impact > 0:
+                    st.success(f"✅ **Rekomendasi:** Strategi ini MENGUNTUNGKAN. Anda mendapatkan tambahan omzet **{format_idr(net_revenue_impact)}** hanya dengan memindahkan budget.")
+                else:
+                    st.error(f"⚠️ **Peringatan:** Strategi ini MERUGIKAN. Jangan pindahkan budget ke klien dengan ROAS lebih rendah.")
             
-            with st.expander("ℹ️  Catatan Teknis: Asumsi & Logika Simulasi", expanded=True):
-                st.markdown("Simulasi ini menggunakan model matematika sederhana untuk estimasi cepat. Harap perhatikan 3 asumsi dasar berikut:")
+                with st.expander("ℹ️  Catatan Teknis: Asumsi & Logika Simulasi", expanded=True):
+                    st.markdown("Simulasi ini menggunakan model matematika sederhana untuk estimasi cepat. Harap perhatikan 3 asumsi dasar berikut:")
                 
-                asm_col1, asm_col2, asm_col3 = st.columns(3)
-                
-                with asm_col1:
-                    st.markdown("#### 📈 1. Linear Growth")
-                    st.caption("*Elastisitas Sempurna*")
-                    st.markdown("""
-                    **Konsep:** ROAS dianggap konstan (*Constant Return to Scale*).
-                    
-                    **Contoh:** Jika budget ditambah **Rp 100 Juta** pada klien dengan ROAS 2x, maka omzet diproyeksikan naik tepat **Rp 200 Juta**.
-                    
-                    ⚠️ **Realita:** Di lapangan sering terjadi *Diminishing Return* (efisiensi menurun seiring besarnya budget).
-                    """)
-
-                with asm_col2:
-                    st.markdown("#### 🌊 2. Market Capacity")
-                    st.caption("*Ketersediaan Pasar*")
-                    st.markdown("""
-                    **Konsep:** Pasar belum jenuh (*Headroom Available*).
-                    
-                    Kita mengasumsikan target audiens masih cukup luas untuk menyerap tambahan iklan ini tanpa menyebabkan biaya iklan (CPC/CPM) melonjak drastis secara tiba-tiba.
-                    """)
-                    
-                with asm_col3:
-                    st.markdown("#### 🎨 3. Creative Stability")
-                    st.caption("*Kualitas Konten Stabil*")
-                    st.markdown("""
-                    **Konsep:** Performa materi iklan konsisten.
-                    
-                    Kita mengasumsikan materi iklan (Gambar/Video) yang ada saat ini masih relevan dan efektif ("Winning Campaign") meskipun frekuensi penayangan ditingkatkan.
-                    """)
-        
+                    for asm_col, (asm_title, asm_caption, asm_body) in zip(st.columns(3), SIM_ASSUMPTIONS):
+                        with asm_col:
+                            st.markdown(asm_title)
+                            st.caption(asm_caption)
+                            st.markdown(asm_body)
+
+        # Index per client_name sekali di sini: lookup source/target di fragment jadi .loc O(1), bukan mask
+        client_reallocation_simulator(client_matrix.set_index('client_name'))
 
 # =====================================================================
 # TAB 3: Business Insight & Strategic Recommendation
@@ -1125,101 +1559,179 @@ with deep_dive_tab:
 with strategy_tab:
     st.header("Business Insight & Strategic Recommendation")
 
-    st.markdown("""
-    Berdasarkan analisis data menyeluruh (Trend, Segmentation, & Simulation), berikut adalah 3 Strategi Utama untuk meningkatkan profitabilitas perusahaan:
-
-    ### **Strategi 1: Smart Budget Reallocation (Cut Traffic, Scale Sales)**
-    * **Masalah:** Ditemukan bahwa **Rp 18.3 Miliar** (52% dari total budget) dihabiskan untuk campaign *Traffic* yang memiliki atribusi purchase nol. Sementara itu, campaign *Sales* terbukti sangat efisien dengan ROAS **1.62x**.
-    * **Rekomendasi (Based on Simulation):**
-        * Segera pindahkan **30-50% budget Traffic** ke campaign Sales.
-        * Berdasarkan simulasi, memindahkan 50% budget (Rp 9 M) berpotensi menghasilkan **tambahan omzet sebesar Rp 14.8 Miliar**, atau kenaikan revenue total sebesar **+51%**.
-    * **Aksi Taktis:** Ubah objektif iklan dari "Link Clicks" menjadi "Conversions/Purchase" pada akun-akun yang sudah matang (FMCG & Fashion).
-
-    ### **Strategi 2: Seasonal Sniper (Fokus Q4 & "THR Moment")**
-    * **Masalah:** Data tren menunjukkan performa belanja harian *flat* di awal tahun, namun meledak hingga 10x lipat di **Oktober-November** (Q4). Selain itu, Ramadhan memiliki rata-rata harian yang rendah, kecuali lonjakan spesifik di bulan April.
-    * **Rekomendasi:**
-        * Terapkan **"Budget Saving Mode"** di Q1-Q3 (Januari-September). Hemat budget, fokus hanya pada *maintenance*.
-        * Lakukan **"All-in Aggressive Spending"** mulai Oktober (untuk event 10.10, 11.11, 12.12).
-        * Untuk Ramadhan: Jangan *spending* besar di awal puasa. Fokuskan budget besar hanya pada **H-10 Lebaran** (saat THR cair), karena data bulan April menunjukkan kenaikan signifikan.
-
-    ### **Strategi 3: Cross-Pollination Strategy (Copy the Winner)**
-    * **Masalah:** Terjadi ketimpangan performa antar klien. **Client C (Fashion)** dan **Client E (FMCG)** adalah "Star" dengan ROAS tinggi, sementara **Client B & D (Beauty)** berada di zona "Alert" (Biaya tinggi, ROAS rendah).
-    * **Rekomendasi:**
-        * **Untuk Traffic Objective (Awareness):** Audit kualitas trafik Client Beauty. Cek apakah landing page-nya relevan. Jika *Bounce Rate* tinggi, perbaiki konten website.
-        * **Untuk Sales Objective (Conversion):** Lakukan A/B Testing pada Client Beauty dengan meniru gaya materi kreatif (Creative Benchmarking) dari Client C.
-        * Gunakan audiens yang berhasil di FMCG (Lookalike Audience) untuk ditargetkan silang ke produk Beauty jika demografinya mirip.
-    """)
+    st.markdown(STRATEGY_MD)
 
 # Sidebar Footer
 st.sidebar.markdown("---")
 st.sidebar.caption("© 2026 Skena Data Team")
 
 # --- DOWNLOAD REPORT (EXCEL) ---
-def generate_excel(df_source):
+# Mode constant_memory XlsxWriter hanya menyimpan satu baris di memori dan wajib ditulis baris per baris,
+# sedangkan DataFrame.to_excel menulis per kolom -> sheet ditulis manual dengan urutan baris.
+# Format kolom (set_column) harus dipasang sebelum baris ditulis karena baris langsung di-flush.
+# Tampilan sel disamakan dengan to_excel: NaN kosong, inf sebagai teks, tanggal 'YYYY-MM-DD HH:MM:SS'.
+# row_formats (opsional): nama format per baris data untuk angka, menimpa format kolom dari set_column.
+def write_frame(worksheet, frame, formats, row_formats=None):
+    worksheet.write_row(0, 0, [str(col) for col in frame.columns], formats['header'])
+    datetime_fmt = formats['datetime']
+    # Nilai diambil sekali per kolom dari array NumPy (.tolist()), jenis kolom ditentukan dari dtype
+    # sehingga loop baris tidak perlu membuat tuple pandas maupun cek isinstance per sel.
+    columns, kinds = [], []
+    for name in frame.columns:
+        values = frame[name].to_numpy()
+        if values.dtype.kind == 'M':
+            columns.append(pd.DatetimeIndex(values).to_pydatetime().tolist())
+        elif values.dtype.kind == 'f':
+            columns.append(values.astype(np.float64).tolist())
+        else:
+            columns.append(values.tolist())
+        kinds.append(values.dtype.kind)
+    for row_idx, row in enumerate(zip(*columns), start=1):
+        number_fmt = formats[row_formats[row_idx - 1]] if row_formats else None
+        for col_idx, (kind, value) in enumerate(zip(kinds, row)):
+            if kind == 'f':
+                if math.isfinite(value):
+                    worksheet.write_number(row_idx, col_idx, value, number_fmt)
+                elif value == value:
+                    worksheet.write_string(row_idx, col_idx, 'inf' if value > 0 else '-inf')
+            elif kind == 'M':
+                worksheet.write_datetime(row_idx, col_idx, value, datetime_fmt)
+            else:
+                worksheet.write(row_idx, col_idx, value)
+
+# Kerangka workbook (format, lebar & format kolom per sheet) tidak pernah berubah antar run:
+# didefinisikan sekali di level modul, generate_excel hanya menerapkannya lalu menulis baris data.
+# (XlsxWriter tidak bisa membuka file yang sudah ada, jadi template biner tidak bisa dipakai ulang.)
+EXCEL_FORMATS = {
+    'currency': {'num_format': 'Rp #,##0'},
+    'percent': {'num_format': '0.00%'},
+    'ratio': {'num_format': '0.00'},
+    'header': {'bold': True, 'bg_color': '#D9D9D9', 'border': 1},
+    'datetime': {'num_format': 'YYYY-MM-DD HH:MM:SS'},
+}
+EXCEL_SHEETS = {
+    'Executive Summary': [('B:B', 20, 'currency')], # Value Column (ROAS/CPC/CTR per baris lewat EXCEL_SUMMARY_FORMATS)
+    'Daily Trend': [('A:A', 15, None), ('B:C', 20, 'currency')], # Date, Money
+    'Client Performance': [('A:A', 25, None), ('B:C', 20, 'currency'), ('D:D', 10, 'ratio')], # Client Name, Spend/Rev, ROAS
+}
+
+# Format angka per baris Executive Summary: Total Spend, Total Revenue, Avg ROAS, Avg CPC, Avg CTR
+EXCEL_SUMMARY_FORMATS = ['currency', 'currency', 'ratio', 'currency', 'percent']
+
+def add_report_sheet(workbook, sheet_name, formats):
+    worksheet = workbook.add_worksheet(sheet_name)
+    for col_range, width, fmt_name in EXCEL_SHEETS[sheet_name]:
+        worksheet.set_column(col_range, width, formats.get(fmt_name))
+    return worksheet
+
+# Bytes laporan di-cache per filter_key: rerun tanpa perubahan filter tidak menulis ulang workbook
+@st.cache_data(show_spinner=False)
+def generate_excel(filter_key, _df_source):
+    df_source = _df_source
     output = io.BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+
+    # --- FORMATTING (XlsxWriter) ---
+    formats = {name: workbook.add_format(props) for name, props in EXCEL_FORMATS.items()}
     
+    # Array kolom dibagi dengan simulasi (get_report_arrays); reduksi langsung di C loop
+    # (akumulator float64 seperti pandas, NaN diabaikan) tanpa overhead Series per metrik
+    cols = get_report_arrays(filter_key, df_source)
+    spend, revenue = cols.spend, cols.revenue
+
     # 1. SHEET: Executive Summary
     summary_data = {
         'Metric': ['Total Spend', 'Total Revenue', 'Avg ROAS', 'Avg CPC', 'Avg CTR'],
         'Value': [
-            df_source['amount_spent'].sum(),
-            df_source['purchase_value'].sum(),
-            df_source['roas'].mean(),
-            df_source['cpc'].mean(),
-            df_source['ctr_percentage'].mean() / 100 # Adjust for percentage format
+            np.nansum(spend, dtype=np.float64),
+            np.nansum(revenue, dtype=np.float64),
+            np.nanmean(cols.roas, dtype=np.float64),
+            np.nanmean(cols.cpc, dtype=np.float64),
+            np.nanmean(cols.ctr, dtype=np.float64) / 100 # Adjust for percentage format
         ]
     }
-    pd.DataFrame(summary_data).to_excel(writer, sheet_name='Executive Summary', index=False)
+    worksheet_summary = add_report_sheet(workbook, 'Executive Summary', formats)
+    write_frame(worksheet_summary, pd.DataFrame(summary_data), formats, EXCEL_SUMMARY_FORMATS)
     
     # 2. SHEET: Daily Trend
-    daily_data = df_source.groupby('created_date')[['amount_spent', 'purchase_value']].sum().reset_index()
-    daily_data.to_excel(writer, sheet_name='Daily Trend', index=False)
+    # filtered_df sudah urut per tanggal (load_data + slice searchsorted), jadi sum harian cukup
+    # np.add.reduceat pada batas pergantian tanggal: satu pass linear tanpa hash grouper
+    dates = cols.dates
+    day_spend, day_revenue = spend, revenue
+    if dates.size > 1 and (dates[1:] < dates[:-1]).any():
+        order = np.argsort(dates, kind='stable')
+        dates, day_spend, day_revenue = dates[order], spend[order], revenue[order]
+    breaks = np.concatenate(([0], np.flatnonzero(dates[1:] != dates[:-1]) + 1))
+    daily_data = pd.DataFrame({
+        'created_date': dates[breaks],
+        'amount_spent': np.add.reduceat(day_spend, breaks, dtype=np.float64),
+        'purchase_value': np.add.reduceat(day_revenue, breaks, dtype=np.float64),
+    })
+    worksheet_trend = add_report_sheet(workbook, 'Daily Trend', formats)
+    write_frame(worksheet_trend, daily_data, formats)
     
     # 3. SHEET: Client Performance
-    client_data = df_source.groupby('client_name')[['amount_spent', 'purchase_value', 'roas']].mean().reset_index() # using mean for roas simplification
-    # Better aggregation for client: Sum Spend/Rev, Recalculate ROAS
-    client_agg = df_source.groupby('client_name')[['amount_spent', 'purchase_value']].sum().reset_index()
-    client_agg['roas'] = client_agg['purchase_value'] / client_agg['amount_spent']
-    client_agg.to_excel(writer, sheet_name='Client Performance', index=False)
-    
-    # 4. SHEET: Raw Data
-    df_source.to_excel(writer, sheet_name='Raw Data', index=False)
-    
-    # --- FORMATTING (XlsxWriter) ---
-    workbook = writer.book
-    currency_fmt = workbook.add_format({'num_format': 'Rp #,##0'})
-    percent_fmt = workbook.add_format({'num_format': '0.00%'}) 
-    header_fmt = workbook.add_format({'bold': True, 'bg_color': '#D9D9D9', 'border': 1})
-    
-    # Apply formats to Sheets
-    worksheet_summary = writer.sheets['Executive Summary']
-    worksheet_summary.set_column('B:B', 20, currency_fmt) # Value Column
-    # Manually fix ROAS/CTR formats in summary (mixed types in one column is tricky, leaving as general/currency for now)
-    
-    worksheet_trend = writer.sheets['Daily Trend']
-    worksheet_trend.set_column('A:A', 15) # Date
-    worksheet_trend.set_column('B:C', 20, currency_fmt) # Money
-    
-    worksheet_client = writer.sheets['Client Performance']
-    worksheet_client.set_column('A:A', 25) # Client Name
-    worksheet_client.set_column('B:C', 20, currency_fmt) # Spend/Rev
-    worksheet_client.set_column('D:D', 10, workbook.add_format({'num_format': '0.00'})) # ROAS
+    # Sum Spend/Rev per klien via np.bincount atas kode kategori (satu pass linear, akumulator float64);
+    # hanya klien yang muncul di filter yang ditulis (setara observed=True), urut sesuai kategori
+    client_codes = cols.client_codes
+    n_clients = len(cols.client_names)
+    observed = np.bincount(client_codes, minlength=n_clients) > 0
+    client_spend = np.bincount(client_codes, weights=spend, minlength=n_clients)[observed]
+    client_revenue = np.bincount(client_codes, weights=revenue, minlength=n_clients)[observed]
+    # Frame final dibangun sekali dari dict-of-arrays (tanpa reset_index / insert kolom susulan)
+    client_agg = pd.DataFrame({
+        'client_name': cols.client_names[observed],
+        'amount_spent': client_spend,
+        'purchase_value': client_revenue,
+        'roas': safe_roas(client_revenue, client_spend), # np.divide where=spend>0: spend 0 -> 0, bukan inf
+    })
+    worksheet_client = add_report_sheet(workbook, 'Client Performance', formats)
+    write_frame(worksheet_client, client_agg, formats)
+    # Raw Data tidak lagi ditulis ke workbook (sheet paling lambat, O(sel) di Python);
+    # data mentah tersedia lewat unduhan CSV/Parquet di sidebar
     
-    writer.close()
+    workbook.close()
     return output.getvalue()
 
-excel_file = generate_excel(filtered_df)
-
+# Export raw memakai filtered_df apa adanya: kolom uang/rasio di load_data tetap float64 (presisi sumber utuh),
+# hanya hitungan clicks/impressions yang di-downcast ke int (nilai tetap sama persis)
+# CSV tetap lewat DataFrame.to_csv agar format file raw (quoting, True/False, angka float '.0') tidak berubah
+# bagi parser hilir. to_csv menulis lewat TextIOWrapper langsung ke BytesIO sebagai UTF-8, jadi tidak ada
+# string CSV perantara + salinan .encode(); bytes-nya di-cache per filter_key.
+@st.cache_data(show_spinner=False)
+def generate_csv(filter_key, _df_source):
+    buffer = io.BytesIO()
+    writer = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+    _df_source.to_csv(writer, index=False)
+    writer.flush()
+    return buffer.getvalue()
+
+# Parquet: ditulis kolumnar oleh pyarrow (C++) + kompresi zstd, jauh lebih kecil & cepat dari XLSX/CSV
+@st.cache_data(show_spinner=False)
+def generate_parquet(filter_key, _df_source):
+    buffer = io.BytesIO()
+    _df_source.to_parquet(buffer, engine='pyarrow', compression='zstd', index=False)
+    return buffer.getvalue()
+
+# data= berupa callable: file baru dibangun saat tombol diklik (bukan di setiap rerun).
+# partial mengikat filter_key & filtered_df dari run ini, lalu hasilnya tetap lewat cache di atas.
+# Callable dijalankan Streamlit di luar script run, jadi render halaman tidak pernah menunggu XlsxWriter;
+# pre-build di ThreadPoolExecutor tidak dipakai karena akan membangun workbook di setiap ganti filter.
 st.sidebar.download_button(
     label="📥 Download Report (Excel)",
-    data=excel_file,
+    data=partial(generate_excel, filter_key, filtered_df),
     file_name="Marketing_Performance_Report.xlsx",
     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 )
 st.sidebar.download_button(
     label="📄 Download Raw Data (CSV)",
-    data=filtered_df.to_csv(index=False).encode('utf-8'),
+    data=partial(generate_csv, filter_key, filtered_df),
     file_name="marketing_data_raw.csv",
     mime="text/csv"
-)
\ No newline at end of file
+)
+st.sidebar.download_button(
+    label="🗃️ Download Raw Data (Parquet)",
+    data=partial(generate_parquet, filter_key, filtered_df),
+    file_name="marketing_data_raw.parquet",
+    mime="application/vnd.apache.parquet"
+)